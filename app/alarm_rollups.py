@@ -0,0 +1,313 @@
+# Archivo: app/alarm_rollups.py
+from datetime import timedelta
+
+import pandas as pd
+
+# Contadores de alarm_counts
+ALARM_COUNTERS = [
+    'disconnected_device',
+    'disconnected_control',
+    'parameters',
+    'sim_high',
+    'sim_critical',
+]
+
+# Tablas de rollup (una fila por bucket con min/max/suma/último de cada contador)
+ROLLUP_TABLES = {
+    "hour":  "alarm_counts_hourly",
+    "day":   "alarm_counts_daily",
+    "month": "alarm_counts_monthly",
+}
+
+# Resolución aproximada de cada bucket en segundos (para elegir la fuente)
+BUCKET_SECONDS = {
+    "raw":   0,
+    "hour":  3600,
+    "day":   86400,
+    "week":  7 * 86400,
+    "month": 30 * 86400,
+}
+
+# Tabla de la que se lee cada resolución (week se reagrupa desde daily)
+_SOURCE = {
+    "raw":   None,
+    "hour":  "hour",
+    "day":   "day",
+    "week":  "day",
+    "month": "month",
+}
+
+_SQL_BUCKET = {
+    "hour":  "DATE_FORMAT(`timestamp`, '%Y-%m-%d %H:00:00')",
+    "day":   "DATE_FORMAT(`timestamp`, '%Y-%m-%d 00:00:00')",
+    "month": "DATE_FORMAT(`timestamp`, '%Y-%m-01 00:00:00')",
+}
+
+
+def bucket_start(ts, bucket):
+    if bucket == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return ts
+
+
+# ----------------------------
+# DDL
+# ----------------------------
+def create_table_statements():
+    statements = []
+    for table in ROLLUP_TABLES.values():
+        cols = []
+        for c in ALARM_COUNTERS:
+            cols += [f"`{c}_min` INT NOT NULL", f"`{c}_max` INT NOT NULL",
+                     f"`{c}_sum` BIGINT NOT NULL", f"`{c}_last` INT NOT NULL"]
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS `{table}` ("
+            "`bucket_start` DATETIME NOT NULL PRIMARY KEY, "
+            "`samples` INT NOT NULL, "
+            "`last_ts` DATETIME NOT NULL, "
+            + ", ".join(cols) + ")"
+        )
+    return statements
+
+
+# Desglose por organización / modelo / categoría: un bucket por hora con la última foto de esa hora
+BREAKDOWN_TABLE = "alarm_breakdown_hourly"
+BREAKDOWN_BUCKET = "hour"
+BREAKDOWN_TEXT_LEN = 128   # longitud de organization / model en la tabla
+
+def create_breakdown_statements():
+    return [
+        f"CREATE TABLE IF NOT EXISTS `{BREAKDOWN_TABLE}` ("
+        "`bucket_start` DATETIME NOT NULL, "
+        "`snapshot_ts` DATETIME NOT NULL, "
+        f"`organization` VARCHAR({BREAKDOWN_TEXT_LEN}) NOT NULL, "
+        f"`model` VARCHAR({BREAKDOWN_TEXT_LEN}) NOT NULL, "
+        "`category` VARCHAR(32) NOT NULL, "
+        "`count` INT NOT NULL, "
+        "PRIMARY KEY (`bucket_start`, `organization`, `model`, `category`), "
+        "KEY `idx_alarm_breakdown_ts` (`snapshot_ts`))"
+    ]
+
+
+# ----------------------------
+# Mantenimiento incremental (al insertar)
+# ----------------------------
+def upsert_statement(bucket):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE que suma una muestra a su bucket.
+    MySQL evalúa las asignaciones en orden: los *_last van antes que last_ts.
+    """
+    table = ROLLUP_TABLES[bucket]
+    cols = ["bucket_start", "samples", "last_ts"]
+    updates = ["samples = samples + VALUES(samples)"]
+    for c in ALARM_COUNTERS:
+        cols += [f"{c}_min", f"{c}_max", f"{c}_sum", f"{c}_last"]
+        updates += [
+            f"{c}_min = LEAST({c}_min, VALUES({c}_min))",
+            f"{c}_max = GREATEST({c}_max, VALUES({c}_max))",
+            f"{c}_sum = {c}_sum + VALUES({c}_sum)",
+            f"{c}_last = IF(VALUES(last_ts) >= last_ts, VALUES({c}_last), {c}_last)",
+        ]
+    updates.append("last_ts = GREATEST(last_ts, VALUES(last_ts))")
+    placeholders = ", ".join(["%s"] * len(cols))
+    return (
+        f"INSERT INTO `{table}` ({', '.join(cols)}) VALUES ({placeholders}) "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+    )
+
+
+def upsert_values(stats, ts, bucket):
+    values = [bucket_start(ts, bucket), 1, ts]
+    for c in ALARM_COUNTERS:
+        v = int(stats.get(c, 0) or 0)
+        values += [v, v, v, v]
+    return tuple(values)
+
+
+def breakdown_upsert_statement():
+    """
+    Una foto sustituye a la anterior de la misma hora fila a fila. Las filas que la
+    foto nueva ya no trae conservan su snapshot_ts antiguo y dejan de leerse
+    (la lectura se queda con las filas del snapshot_ts más reciente).
+    """
+    return (
+        f"INSERT INTO `{BREAKDOWN_TABLE}` (bucket_start, snapshot_ts, organization, model, category, count) "
+        "VALUES (%s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE snapshot_ts = VALUES(snapshot_ts), count = VALUES(count)"
+    )
+
+
+def breakdown_values(breakdown, ts):
+    """
+    Filas para breakdown_upsert_statement desde {(organización, modelo, categoría): n}.
+    Organización y modelo se recortan al tamaño de la columna; si dos quedan iguales
+    tras el recorte se suman, para no pisarse en la clave primaria.
+    """
+    merged = {}
+    for (org, model, category), count in breakdown.items():
+        if not count:
+            continue
+        key = (str(org)[:BREAKDOWN_TEXT_LEN], str(model)[:BREAKDOWN_TEXT_LEN], category)
+        merged[key] = merged.get(key, 0) + count
+    if not merged:
+        # Foto vacía: fila marcador con count 0 para que la última foto refleje "sin alarmas"
+        merged[("", "", "")] = 0
+    bucket = bucket_start(ts, BREAKDOWN_BUCKET)
+    return [(bucket, ts, org, model, category, count) for (org, model, category), count in merged.items()]
+
+
+def breakdown_prune_statement():
+    """Borra los buckets del desglose anteriores a %s (retención)."""
+    return f"DELETE FROM `{BREAKDOWN_TABLE}` WHERE bucket_start < %s"
+
+
+def compaction_statement(bucket):
+    """
+    Recalcula desde alarm_counts los buckets de [desde, hasta): sirve para el
+    backfill inicial y para reparar rollups (idempotente, sustituye los valores).
+    """
+    table = ROLLUP_TABLES[bucket]
+    expr = _SQL_BUCKET[bucket]
+    cols = ["bucket_start", "samples", "last_ts"]
+    select = [f"{expr}", "COUNT(*)", "MAX(`timestamp`)"]
+    for c in ALARM_COUNTERS:
+        cols += [f"{c}_min", f"{c}_max", f"{c}_sum", f"{c}_last"]
+        select += [
+            f"MIN({c})", f"MAX({c})", f"SUM({c})",
+            f"CAST(SUBSTRING_INDEX(GROUP_CONCAT({c} ORDER BY `timestamp` DESC, id DESC), ',', 1) AS SIGNED)",
+        ]
+    updates = [f"{col} = VALUES({col})" for col in cols[1:]]
+    return (
+        f"INSERT INTO `{table}` ({', '.join(cols)}) "
+        f"SELECT {', '.join(select)} FROM alarm_counts "
+        "WHERE `timestamp` >= %s AND `timestamp` < %s "
+        f"GROUP BY {expr} "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+    )
+
+
+# ----------------------------
+# Lectura por rango
+# ----------------------------
+def choose_bucket(start, end, requested="auto", max_points=500):
+    """
+    Resolución a servir. Con 'auto' se elige la más fina que no supere max_points
+    en el rango (raw solo para rangos de un día o menos).
+    """
+    if requested and requested != "auto":
+        if requested not in BUCKET_SECONDS:
+            raise ValueError(f"bucket inválido: {requested} (raw, hour, day, week, month, auto)")
+        return requested
+    span = max((end - start).total_seconds(), 0)
+    if span <= 86400:
+        return "raw"
+    for bucket in ("hour", "day", "week", "month"):
+        if span / BUCKET_SECONDS[bucket] <= max_points:
+            return bucket
+    return "month"
+
+
+def range_query(bucket):
+    """(query, tabla) para leer la resolución pedida desde la tabla más gruesa que la cubre."""
+    source = _SOURCE[bucket]
+    if source is None:
+        return "SELECT * FROM alarm_counts WHERE `timestamp` >= %s AND `timestamp` < %s ORDER BY `timestamp`", "alarm_counts"
+    table = ROLLUP_TABLES[source]
+    return (
+        f"SELECT * FROM `{table}` WHERE bucket_start >= %s AND bucket_start < %s ORDER BY bucket_start",
+        table,
+    )
+
+
+def range_bounds(start, end, bucket):
+    """Amplía el inicio al comienzo de su bucket para no perder el primer tramo."""
+    return (bucket_start(start, bucket) if _SOURCE[bucket] else start), end
+
+
+def format_rows(rows, bucket):
+    """
+    Filas de alarm_counts o de un rollup → serie uniforme:
+    timestamp, samples y por contador: valor medio, _min, _max, _last.
+    """
+    if not rows:
+        return []
+
+    if _SOURCE[bucket] is None:
+        out = []
+        for r in rows:
+            rec = {"timestamp": r.get("timestamp"), "samples": 1}
+            for c in ALARM_COUNTERS:
+                v = r.get(c)
+                rec.update({c: v, f"{c}_min": v, f"{c}_max": v, f"{c}_last": v})
+            out.append(rec)
+        return out
+
+    df = pd.DataFrame(rows)
+
+    if bucket == "week":
+        df["bucket_start"] = pd.to_datetime(df["bucket_start"])
+        df["week"] = df["bucket_start"] - pd.to_timedelta(df["bucket_start"].dt.weekday, unit="D")
+        df = df.sort_values("last_ts")
+        agg = {"samples": "sum", "last_ts": "max"}
+        for c in ALARM_COUNTERS:
+            agg.update({f"{c}_min": "min", f"{c}_max": "max", f"{c}_sum": "sum", f"{c}_last": "last"})
+        df = df.groupby("week", sort=True).agg(agg).reset_index().rename(columns={"week": "bucket_start"})
+
+    out = []
+    for r in df.to_dict(orient="records"):
+        samples = int(r["samples"]) or 1
+        ts = r["bucket_start"]
+        rec = {"timestamp": ts.to_pydatetime() if hasattr(ts, "to_pydatetime") else ts, "samples": samples}
+        for c in ALARM_COUNTERS:
+            rec[c] = round(float(r[f"{c}_sum"]) / samples, 2)
+            rec[f"{c}_min"] = int(r[f"{c}_min"])
+            rec[f"{c}_max"] = int(r[f"{c}_max"])
+            rec[f"{c}_last"] = int(r[f"{c}_last"])
+        out.append(rec)
+    return out
+
+
+# ----------------------------
+# Desglose: agregación para la API
+# ----------------------------
+BREAKDOWN_GROUPS = {
+    "organization": ("organization",),
+    "model": ("model",),
+    "organization_model": ("organization", "model"),
+}
+
+def group_breakdown(rows, group_by="organization", organization=None):
+    """
+    Agrega las filas de una foto del desglose (BREAKDOWN_TABLE) por las dimensiones pedidas,
+    con un contador por categoría y el total. Ordenado por total descendente.
+    """
+    if group_by not in BREAKDOWN_GROUPS:
+        raise ValueError(f"group_by debe ser uno de {sorted(BREAKDOWN_GROUPS)}")
+    dims = BREAKDOWN_GROUPS[group_by]
+    wanted = organization.strip().upper() if organization else None
+
+    groups = {}
+    for row in rows:
+        if not row["count"]:
+            continue
+        if wanted and str(row["organization"]).upper() != wanted:
+            continue
+        key = tuple(row[d] for d in dims)
+        entry = groups.get(key)
+        if entry is None:
+            entry = dict(zip(dims, key))
+            entry.update({c: 0 for c in ALARM_COUNTERS})
+            entry["total"] = 0
+            groups[key] = entry
+        if row["category"] in entry:
+            entry[row["category"]] += int(row["count"])
+        entry["total"] += int(row["count"])
+
+    return sorted(groups.values(), key=lambda e: e["total"], reverse=True)
@@ -3,21 +3,103 @@ import requests
 import pandas as pd
 import json
 import os
+import random
+import threading
+import time
+import hashlib
+import itertools
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 from app.config.settings import Settings
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.hedging import LatencyTracker, HedgeBudget, RequestCancelled, hedged_call, timed
+from concurrent.futures import ThreadPoolExecutor
+from app.json_stream import iter_json_array
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Estados HTTP que merece la pena reintentar (transitorios)
+RETRY_STATUS = {429, 502, 503, 504}
+
+# Envoltorios de listado que se extraen en streaming (mismo orden que _get_data)
+LIST_ENVELOPE_KEYS = ("content", "data")
+
+# Campos que se conservan por dataset con CORE_FIELD_PROJECTION (el resto se descarta al parsear).
+# Solo datasets que se procesan antes de devolverse: los que llegan crudos al frontend no se recortan.
+FIELD_PROJECTIONS = {
+    Settings.URL_M2M: [
+        "icc", "ICC", "sim_icc", "sim_iccid", "iccid",
+        "lifeCycleStatus", "servicePack", "ratType", "customField1", "alias",
+        "consumptionDaily", "consumptionMonthly", "presence", "alarms", "commercialGroupId",
+        "name", "m2m_name", "sim_name", "description",
+    ],
+}
+
+def _projector(fields):
+    """Recorta un registro a los campos indicados (lo que no sea dict pasa tal cual)."""
+    def project(rec):
+        return {k: rec[k] for k in fields if k in rec} if isinstance(rec, dict) else rec
+    return project
+
+class _LRUDict(OrderedDict):
+    """
+    Dict acotado (LRU): get() marca la entrada como reciente y, al pasar de
+    maxsize, se descarta la más antigua. No es thread-safe por sí mismo:
+    CoreClient lo usa siempre bajo su _lock.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
 
 class CoreClient:
     def __init__(self, token=None):
         # Usamos el token de settings si no se provee uno
         self.token = token or Settings.API_TOKEN
         self.headers = {'Authorization': f"{self.token}"}
+        # Sesión compartida: reutiliza conexiones entre llamadas e hilos
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+        # gzip/deflate siempre; br/zstd si urllib3 tiene el decodificador instalado
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self.timeout = (Settings.CORE_CONNECT_TIMEOUT, Settings.CORE_READ_TIMEOUT)
+        self._breakers = {}
+        self._last_good = _LRUDict(Settings.CORE_CACHE_MAX_ENTRIES)  # (url, params) -> última lista buena
+        self._validators = _LRUDict(Settings.CORE_CACHE_MAX_ENTRIES)  # (url, params) -> {"etag", "last_modified", "digest", "payload"}
+        self.fingerprints = {} # url -> huella de la última respuesta (ETag o hash del cuerpo)
+        self._lock = threading.Lock()
+        # Hedging de GETs (opcional): umbral adaptativo por URL y presupuesto global
+        self.latencies = LatencyTracker()
+        self.hedge_budget = HedgeBudget(ratio=Settings.CORE_HEDGE_BUDGET)
+        self.hedges_sent = 0
+        self._hedge_pool = ThreadPoolExecutor(max_workers=Settings.CORE_HEDGE_WORKERS, thread_name_prefix="core-hedge") if Settings.CORE_HEDGE else None
+        # Páginas restantes de los listados paginados (compartido: acota la concurrencia total)
+        self._page_pool = ThreadPoolExecutor(max_workers=max(1, Settings.CORE_PAGE_WORKERS), thread_name_prefix="core-page")
 
     def login(self):
         """DEPRECATED: El login ya no es necesario con el uso de API Token"""
         print("⚠️ Aviso: El método login() está deprecado. Usando API Token.")
         return self.token
     
-    def _post(self, url, json_payload=None):
-        """ Wrapper robusto para POST """
+    def _post(self, url, json_payload=None, breaker_key=None):
+        """ Wrapper robusto para POST (breaker por breaker_key o por URL; sin reintentos) """
         # Eliminada lógica de auto-login
         headers = self.headers.copy()
         
@@ -26,7 +108,16 @@ class CoreClient:
             print(f"\n📡 [POST] URL: {url}")
             print(f"📦 [PAYLOAD]: {json.dumps(json_payload)}") 
             
-            response = requests.post(url, json=json_payload, headers=headers, timeout=15)
+            breaker = self._breaker(breaker_key or url)
+            breaker.before_call()
+            started = time.monotonic()
+            try:
+                response = self.session.post(url, json=json_payload, headers=headers, timeout=(Settings.CORE_CONNECT_TIMEOUT, 15))
+            except Exception:
+                # Cualquier excepción (no solo de requests) debe liberar la sonda de HALF_OPEN
+                breaker.record(False, time.monotonic() - started)
+                raise
+            breaker.record(response.status_code < 500, time.monotonic() - started)
             
             # DEBUG: Ver respuesta cruda si hay error lógico
             if response.status_code == 200:
@@ -75,7 +166,7 @@ class CoreClient:
     
     def get_m2m_history(self, icc, payload):
         url = Settings.URL_HISTORY.format(icc=icc)
-        return self._post(url, json_payload=payload)
+        return self._post(url, json_payload=payload, breaker_key=Settings.URL_HISTORY)
     
 
     def get_m2m_renewals(self, show_all=True, from_date=None, to=None):
@@ -111,19 +202,320 @@ class CoreClient:
         )
 
 
+    # --- RESILIENCIA: BREAKERS, REINTENTOS Y ÚLTIMA RESPUESTA BUENA ---
+    def _breaker(self, url):
+        with self._lock:
+            if url not in self._breakers:
+                self._breakers[url] = CircuitBreaker(
+                    url,
+                    failure_rate=Settings.CORE_BREAKER_FAILURE_RATE,
+                    slow_call_s=Settings.CORE_BREAKER_SLOW_S,
+                    open_seconds=Settings.CORE_BREAKER_OPEN_S,
+                )
+            return self._breakers[url]
+
+    def breaker_stats(self):
+        with self._lock:
+            return {url: b.snapshot() for url, b in self._breakers.items()}
+
+    @staticmethod
+    def _cache_key(url, params):
+        return (url, tuple(sorted((params or {}).items())))
+
+    def _attempt(self, url, params=None, cancel=None):
+        """
+        Un único GET condicional. Si otro intento ya ganó (cancel), suelta la
+        conexión sin leer el cuerpo. Con un 304, o con un cuerpo idéntico al
+        anterior (mismo hash), devuelve el mismo objeto ya parseado sin volver a
+        parsear: quien llama puede detectar "sin cambios" por identidad.
+        """
+        cache_key = self._cache_key(url, params)
+        with self._lock:
+            cached = self._validators.get(cache_key)
+        headers = self.headers
+        if cached:
+            headers = dict(self.headers)
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self.session.get(url, headers=headers, params=params, timeout=self.timeout, stream=True)
+        try:
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(url)
+            if resp.status_code == 304 and cached:
+                return cached["payload"]
+            resp.raise_for_status()
+
+            hasher = hashlib.blake2b(digest_size=16)
+            def _chunks():
+                for chunk in resp.iter_content(chunk_size=Settings.CORE_STREAM_CHUNK):
+                    # Perdedor de un hedge: deja de leer en cuanto el otro intento gana
+                    if cancel is not None and cancel.is_set():
+                        raise RequestCancelled(url)
+                    hasher.update(chunk)
+                    yield chunk
+            fields = FIELD_PROJECTIONS.get(url) if Settings.CORE_FIELD_PROJECTION else None
+            if fields or Settings.CORE_STREAM_DECODE:
+                payload = self._decode_stream(_chunks(), fields)
+            else:
+                payload = _loads(b"".join(_chunks()))
+        finally:
+            resp.close()
+
+        if cancel is not None and cancel.is_set():
+            # Ya hay ganador: su respuesta (quizá más reciente) es la que queda en _validators
+            raise RequestCancelled(url)
+        digest = hasher.hexdigest()
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if cached and cached.get("digest") == digest:
+            payload = cached["payload"]
+        with self._lock:
+            self._validators[cache_key] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "digest": digest,
+                "payload": payload,
+            }
+            self.fingerprints[url] = etag or digest
+        return payload
+
+    def _decode_stream(self, chunks, fields=None):
+        """
+        Decodifica el cuerpo según llega: los registros del listado (array raíz o
+        content / data) se extraen uno a uno, recortados a `fields` si se indican,
+        sin tener nunca el cuerpo completo ni el JSON entero en memoria.
+        Devuelve la lista, o el objeto envoltorio con la lista en "content".
+        """
+        project = _projector(fields) if fields else None
+        chunks = iter(chunks)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if head.lstrip():
+                break
+        if head.lstrip()[:1] not in (b"[", b"{"):
+            # Ni array ni objeto (null, texto, número): se devuelve tal cual, como response.json();
+            # _get_data lo trata como listado vacío sin contarlo como fallo del upstream
+            return _loads(head + b"".join(chunks))
+
+        meta = {}
+        records = list(iter_json_array(
+            itertools.chain([head], chunks), envelope_keys=LIST_ENVELOPE_KEYS, meta=meta, project=project
+        ))
+        if not meta:
+            return records
+        if records:
+            return {**meta, "content": records}
+        return meta
+
+    def fingerprint(self, url):
+        """Huella de la última respuesta de la URL (None si aún no se ha pedido)."""
+        with self._lock:
+            return self.fingerprints.get(url)
+
+    def _count_hedge(self):
+        with self._lock:
+            self.hedges_sent += 1
+
+    def _send(self, url, params=None):
+        """
+        GET (un intento lógico). Con CORE_HEDGE, si no responde antes del p95
+        observado para esa URL se lanza una segunda petición idéntica y gana la
+        primera; el presupuesto CORE_HEDGE_BUDGET limita el tráfico extra.
+        """
+        attempt = timed(self.latencies, url, lambda cancel: self._attempt(url, params, cancel))
+        if self._hedge_pool is None:
+            return attempt(None)
+        threshold = self.latencies.percentile(url, Settings.CORE_HEDGE_PERCENTILE)
+        if threshold is None:
+            # Aún sin histórico suficiente para esta URL: sin hedge
+            return attempt(None)
+        delay = max(threshold, Settings.CORE_HEDGE_MIN_DELAY)
+        return hedged_call(self._hedge_pool, attempt, delay, self.hedge_budget, on_hedge=self._count_hedge)
+
+    def hedge_stats(self):
+        return {
+            "enabled": self._hedge_pool is not None,
+            "hedges_sent": self.hedges_sent,
+            "thresholds": {
+                url: self.latencies.percentile(url, Settings.CORE_HEDGE_PERCENTILE)
+                for url in list(self._breakers)
+            },
+        }
+
+    def _get_json(self, url, params=None):
+        """
+        GET con breaker por URL y reintentos con backoff exponencial y jitter
+        (solo errores transitorios: conexión, timeout, 429 y 5xx de pasarela).
+        Con el breaker abierto falla al instante con CircuitOpenError.
+        """
+        breaker = self._breaker(url)
+        attempts = Settings.CORE_RETRIES + 1
+        for attempt in range(attempts):
+            breaker.before_call()
+            started = time.monotonic()
+            try:
+                data = self._send(url, params)
+            except ValueError:
+                # Cuerpo no JSON (o URL inválida): cuenta como fallo del upstream, no se reintenta
+                breaker.record(False, time.monotonic() - started)
+                raise
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                transient = status is None or status in RETRY_STATUS
+                # Un 4xx (salvo 429) es un error de la petición, no un upstream enfermo
+                breaker.record(not transient and status < 500, time.monotonic() - started)
+                if not transient or attempt == attempts - 1:
+                    raise
+                delay = random.uniform(0, Settings.CORE_RETRY_BACKOFF * (2 ** attempt))
+                print(f"🔁 Reintento {attempt + 1}/{attempts - 1} de {url} en {delay:.2f}s ({e})")
+                time.sleep(delay)
+                continue
+            except Exception:
+                # Cualquier otro fallo también cierra la llamada: si era la sonda de
+                # HALF_OPEN, sin este record el breaker se quedaría esperándola siempre
+                breaker.record(False, time.monotonic() - started)
+                raise
+            breaker.record(True, time.monotonic() - started)
+            return data
+
+    # --- PAGINACIÓN AUTOMÁTICA ---
+    def _page_size(self, url):
+        """Tamaño de página configurado para la URL (CORE_PAGE_SIZES por ruta, si no CORE_PAGE_SIZE)."""
+        path = url[len(Settings.BASE_URL):].strip("/") if url.startswith(Settings.BASE_URL) else url
+        return Settings.CORE_PAGE_SIZES.get(path, Settings.CORE_PAGE_SIZE)
+
+    def _get_page(self, url, params=None):
+        """GET de una página. Devuelve (payload, sin_cambios respecto a la anterior respuesta)."""
+        with self._lock:
+            previous = self._validators.get(self._cache_key(url, params), {}).get("payload")
+        data = self._get_json(url, params)
+        return data, previous is not None and data is previous
+
+    @staticmethod
+    def _is_paged(data):
+        return isinstance(data, dict) and ("totalPages" in data or "last" in data) and isinstance(data.get("content", []), list)
+
+    @staticmethod
+    def _page_head(page):
+        """Primer registro de la página serializado (para detectar páginas repetidas)."""
+        content = page.get("content") or []
+        return json.dumps(content[0], sort_keys=True, default=str) if content else None
+
+    def _remaining_pages(self, url, params, first):
+        """
+        Resto de páginas de un sobre paginado, en orden. Con totalPages (o
+        totalElements y size) se piden en paralelo con CORE_PAGE_WORKERS hilos;
+        si el servidor solo indica `last`, se recorren una a una.
+        Nunca más de CORE_MAX_PAGES páginas en total, y se corta en la primera
+        página que repite a una anterior (servidor que ignora `page`).
+        Devuelve [(params, payload, sin_cambios)] por página.
+        """
+        number = first.get("number") or 0
+        size = first.get("size") or len(first.get("content") or []) or None
+        total_pages = first.get("totalPages")
+        if total_pages is None and first.get("totalElements") is not None and size:
+            total_pages = -(-first["totalElements"] // size)
+        max_page = number + max(1, Settings.CORE_MAX_PAGES)
+
+        def page_params(n):
+            p = dict(params or {})
+            p["page"] = n
+            if size:
+                p["size"] = size
+            return p
+
+        seen_heads = {self._page_head(first)}
+
+        def repeated(page):
+            head = self._page_head(page)
+            if head is not None and head in seen_heads:
+                print(f"⚠️ Página repetida en {url} ({page.get('number')}); se corta la paginación")
+                return True
+            seen_heads.add(head)
+            return False
+
+        if total_pages is not None:
+            if total_pages > max_page:
+                print(f"⚠️ {url}: {total_pages} páginas; solo se piden {Settings.CORE_MAX_PAGES} (CORE_MAX_PAGES)")
+                total_pages = max_page
+            requested = [page_params(n) for n in range(number + 1, total_pages)]
+            futures = [self._page_pool.submit(self._get_page, url, p) for p in requested]
+            # En orden de página; el primer fallo se propaga y se descarta el listado entero
+            pages = []
+            for p, f in zip(requested, futures):
+                current, same = f.result()
+                if repeated(current):
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                pages.append((p, current, same))
+            return pages
+
+        pages = []
+        current, n = first, number
+        while current.get("last") is False and current.get("content"):
+            n += 1
+            if n >= max_page:
+                print(f"⚠️ {url}: alcanzado el máximo de {Settings.CORE_MAX_PAGES} páginas (CORE_MAX_PAGES); se corta")
+                break
+            p = page_params(n)
+            current, same = self._get_page(url, p)
+            if not self._is_paged(current) or repeated(current):
+                break
+            pages.append((p, current, same))
+        return pages
+
+    def _combine_fingerprint(self, url, page_params):
+        """Huella del listado completo: combina las de todas sus páginas."""
+        with self._lock:
+            parts = [
+                (self._validators.get(self._cache_key(url, p)) or {}).get("digest") or ""
+                for p in page_params
+            ]
+            self.fingerprints[url] = hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
     # --- VERIFICACION Y OBTENCIÓN DE DATOS MEJORADA ---
     def _get_data(self, url, filename="resources/output.xlsx", params=None):
         # Eliminada lógica de auto-login
+        size = self._page_size(url)
+        if size:
+            # Tamaño de página fijado para este dataset: se pide desde la primera página
+            params = {**(params or {}), "page": 0, "size": size}
+        cache_key = self._cache_key(url, params)
+        with self._lock:
+            last_list = self._last_good.get(cache_key)
         try:
             print(f"Fetching: {url}")
-            resp = requests.get(url, headers=self.headers, params=params, timeout=30)
-            resp.raise_for_status() 
+            data, unchanged = self._get_page(url, params)
+
+            pages = []
+            if self._is_paged(data) and data.get("last") is not True:
+                pages = self._remaining_pages(url, params, data)
+                unchanged = unchanged and all(same for _, _, same in pages)
+                if pages:
+                    self._combine_fingerprint(url, [params] + [p for p, _, _ in pages])
+
+            # 304 o cuerpo idéntico (en todas las páginas): misma lista de antes, sin extraer ni exportar de nuevo
+            if unchanged and last_list is not None:
+                print(f"Sin cambios en {filename}: {len(last_list)} registros (caché).")
+                return last_list
 
-            data = resp.json()
             list_data = []
 
+            # 0. Sobre paginado: se concatenan las páginas en orden
+            if self._is_paged(data):
+                list_data = list(data.get("content") or [])
+                for _, page, _ in pages:
+                    list_data.extend(page.get("content") or [])
+                if pages:
+                    print(f"📄 {filename}: {len(pages) + 1} páginas")
+
             # 1. Si es lista directa
-            if isinstance(data, list):
+            elif isinstance(data, list):
                 list_data = data
             
             # 2. Si es diccionario, buscamos la lista dentro
@@ -143,10 +535,18 @@ class CoreClient:
             # 3. SIEMPRE intentamos exportar, aunque esté vacío (para debug)
             print(f"Datos recibidos para {filename}: {len(list_data)} registros.")
             self._export_columns_to_excel(list_data, filename)
-            
+
+            with self._lock:
+                self._last_good[cache_key] = list_data
             return list_data
         
         except Exception as e:
+            with self._lock:
+                fallback = self._last_good.get(cache_key)
+            if fallback is not None:
+                kind = "circuito abierto" if isinstance(e, CircuitOpenError) else "error"
+                print(f"⚠️ {filename}: {kind} ({e}); se sirve la última respuesta buena ({len(fallback)} registros)")
+                return fallback
             print(f"ERROR CRÍTICO en {filename}: {e}")
             return []
 
@@ -0,0 +1,178 @@
+# Archivo: app/change_feed.py
+import threading
+import uuid
+from collections import deque
+
+import pandas as pd
+
+
+def row_hashes(df, key_column):
+    """
+    Hash por fila del contenido (vectorizado con hash_pandas_object), indexado por clave.
+    Las columnas se ordenan para que un cambio de orden no cuente como cambio.
+    """
+    df = df.drop_duplicates(subset=[key_column], keep="last")
+    keys = df[key_column].astype(str)
+    content = df[sorted(df.columns)]
+    try:
+        hashes = pd.util.hash_pandas_object(content, index=False)
+    except TypeError:
+        # Celdas no hashables (listas / dicts): se comparan por su representación en texto
+        hashes = pd.util.hash_pandas_object(content.astype(str), index=False)
+    return pd.Series(hashes.to_numpy(), index=keys.to_numpy()), df.set_axis(keys.to_numpy())
+
+
+def new_epoch():
+    """Identificador de arranque: las versiones de otro proceso nunca coinciden con las de este."""
+    return uuid.uuid4().hex[:8]
+
+
+def _records(df):
+    if df.empty:
+        return []
+    df = df.astype(object)
+    return df.where(pd.notnull(df), None).to_dict(orient="records")
+
+
+class ChangeFeed:
+    """
+    Feed de cambios de un dataset. Cada refresco se compara con el anterior por
+    clave (uuid / icc / pool_id) y hash de fila; si hay diferencias se sube la
+    versión y se guarda el delta (altas, modificaciones, bajas) en un anillo
+    acotado. Un cliente con la versión N pide los cambios desde N; si N ya ha
+    salido del anillo recibe resync y debe descargar el dataset completo.
+    La versión pública es "<epoch>-<n>": tras un reinicio el contador vuelve a
+    empezar con otro epoch, así una versión antigua siempre recibe resync.
+    """
+
+    def __init__(self, key_column, max_deltas=50, epoch=None):
+        self.key_column = key_column
+        self.epoch = epoch or new_epoch()
+        self.version = 0
+        self._hashes = None
+        self._deltas = deque(maxlen=max_deltas)   # (versión, altas, modificaciones, bajas)
+        self._last_df = None
+        self._lock = threading.Lock()
+
+    def token(self, version=None):
+        """Versión pública (con epoch) de `version`, por defecto la actual."""
+        return f"{self.epoch}-{self.version if version is None else version}"
+
+    def parse(self, token):
+        """Número de versión de un token de este proceso, o None si es de otro epoch / no válido."""
+        epoch, sep, number = str(token).rpartition("-")
+        if not sep or epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def update(self, df):
+        """Registra un refresco del dataset. Devuelve la versión resultante (token)."""
+        return self.token(self._update(df))
+
+    def _update(self, df):
+        if df is None or df.empty or self.key_column not in df.columns:
+            # Vacío suele ser un fallo del upstream (_get_data devuelve []): no se toma como "todo borrado"
+            return self.version
+
+        if df is self._last_df:
+            # Mismo frame (origen sin cambios): nada que comparar
+            return self.version
+
+        hashes, by_key = row_hashes(df, self.key_column)
+        with self._lock:
+            self._last_df = df
+            previous = self._hashes
+            self._hashes = hashes
+            if previous is None:
+                # Primera foto: es la base, no hay delta que contar
+                self.version += 1
+                return self.version
+
+            common = hashes.index.intersection(previous.index)
+            inserted = hashes.index.difference(previous.index)
+            deleted = previous.index.difference(hashes.index)
+            changed = common[hashes.loc[common].to_numpy() != previous.loc[common].to_numpy()]
+
+            if not len(inserted) and not len(deleted) and not len(changed):
+                return self.version
+
+            self.version += 1
+            self._deltas.append((
+                self.version,
+                _records(by_key.loc[inserted]),
+                _records(by_key.loc[changed]),
+                list(deleted),
+            ))
+            return self.version
+
+    def changes(self, since_token):
+        """
+        Cambios netos desde la versión `since_token` ("<epoch>-<n>"):
+        {"version", "since", "resync", "inserts", "updates", "deletes"}.
+        """
+        with self._lock:
+            version = self.version
+            deltas = list(self._deltas)
+
+        result = {"version": self.token(version), "since": since_token, "resync": False, "inserts": [], "updates": [], "deletes": []}
+        since = self.parse(since_token)
+        if since is None:
+            # Versión de otro arranque (o mal formada): no se puede calcular un delta fiable
+            result["resync"] = True
+            return result
+        if since == version:
+            return result
+        oldest_base = deltas[0][0] - 1 if deltas else version
+        if since > version or since < oldest_base:
+            result["resync"] = True
+            return result
+
+        # Estado neto por clave: si existía en `since` y cómo queda al final
+        state = {}   # clave -> (existía antes, registro final o None si borrado)
+        key_col = self.key_column
+        for v, inserts, updates, deletes in deltas:
+            if v <= since:
+                continue
+            for rec in inserts:
+                key = str(rec[key_col])
+                existed = state[key][0] if key in state else False
+                state[key] = (existed, rec)
+            for rec in updates:
+                key = str(rec[key_col])
+                existed = state[key][0] if key in state else True
+                state[key] = (existed, rec)
+            for key in deletes:
+                existed = state[key][0] if key in state else True
+                state[key] = (existed, None)
+
+        for key, (existed, rec) in state.items():
+            if rec is None:
+                if existed:
+                    result["deletes"].append(key)
+            elif existed:
+                result["updates"].append(rec)
+            else:
+                result["inserts"].append(rec)
+        return result
+
+
+class ChangeFeedRegistry:
+    """Un ChangeFeed por dataset, creado la primera vez que se registra."""
+
+    def __init__(self, max_deltas=50):
+        self.max_deltas = max_deltas
+        self.epoch = new_epoch()   # común a todos los feeds del proceso
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def feed(self, dataset, key_column):
+        with self._lock:
+            if dataset not in self._feeds:
+                self._feeds[dataset] = ChangeFeed(key_column, self.max_deltas, epoch=self.epoch)
+            return self._feeds[dataset]
+
+    def record(self, dataset, key_column, df):
+        return self.feed(dataset, key_column).update(df)
+
+    def get(self, dataset):
+        return self._feeds.get(dataset)
@@ -0,0 +1,82 @@
+# Archivo: app/circuit_breaker.py
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El breaker del endpoint está abierto: no se llama al upstream."""
+
+
+class CircuitBreaker:
+    """
+    Breaker por endpoint con ventana de las últimas `window` llamadas.
+    - closed: se abre si, con al menos `min_calls`, la tasa de errores o la de
+      llamadas lentas (> slow_call_s) supera su umbral.
+    - open: falla al instante durante `open_seconds`.
+    - half_open: deja pasar una única llamada de prueba; si va bien se cierra,
+      si falla vuelve a abrirse.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5,
+                 slow_call_s=10.0, slow_rate=0.8, open_seconds=30.0):
+        self.name = name
+        self.window = deque(maxlen=window)   # (ok, lenta)
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Lanza CircuitOpenError si la llamada no debe salir."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    raise CircuitOpenError(f"Circuito abierto para {self.name}")
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(f"Circuito semiabierto para {self.name} (prueba en curso)")
+                self._probe_in_flight = True
+
+    def record(self, ok, elapsed):
+        with self._lock:
+            slow = elapsed > self.slow_call_s
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok and not slow:
+                    self.state = CLOSED
+                    self.window.clear()
+                    print(f"✅ [Breaker] {self.name} cerrado de nuevo")
+                else:
+                    self._open()
+                return
+
+            self.window.append((ok, slow))
+            calls = len(self.window)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for o, _ in self.window if not o)
+            slows = sum(1 for _, s in self.window if s)
+            if failures / calls >= self.failure_rate or slows / calls >= self.slow_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.window.clear()
+        print(f"🔌 [Breaker] {self.name} abierto durante {self.open_seconds:.0f}s")
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "calls": len(self.window)}
@@ -1,25 +1,108 @@
+import json
 import requests
+from requests.adapters import HTTPAdapter
 from app.config.settings import Settings
+from app.json_stream import iter_json_array
 
 class CloudClient:
     def __init__(self, token=None):
         self.token = token or Settings.CLOUD_API_TOKEN
         self.base_url = Settings.CLOUD_BASE_URL
         self.headers = {"X-QUIIOT-TOKEN": self.token}
+        # Sesión persistente: reutiliza conexiones TCP/TLS entre llamadas (modo daemon)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
-    def get_alarms(self, state="1,2"):
+    def close(self):
+        self.session.close()
+
+    def get_alarms(self, state="1,2", raise_errors=False):
         """
         Obtiene las alarmas desde la API de Cloud filtered por estado.
         Por defecto trae activas (1) y no reconocidas/otras (2).
+        Con raise_errors=True los fallos se propagan en lugar de devolver []
+        (el collector los necesita para aplicar backoff).
+        """
+        try:
+            return list(self.iter_alarms(state=state, raise_errors=True))
+        except Exception:
+            if raise_errors:
+                raise
+            return []
+
+    def iter_alarms(self, state="1,2", raise_errors=False, page_size=None):
+        """
+        Igual que get_alarms pero como generador: las alarmas se parsean y se
+        entregan según llega la respuesta, sin cargarla entera en memoria.
+        Sigue la paginación de la API si la hay (cursor / enlace "next" en un
+        objeto envoltorio, o limit/offset con CLOUD_ALARMS_PAGE_SIZE).
+        La paginación se corta si una página se repite (mismo cursor / enlace, o
+        una página que empieza por la misma alarma que otra ya vista: el servidor
+        ignora limit/offset) y, en todo caso, tras CLOUD_ALARMS_MAX_PAGES páginas.
+        Sin raise_errors un fallo corta el generador (lo ya entregado se queda).
         """
         url = f"{self.base_url}/devices/alarms"
         params = {"state": state}
-        
+        page_size = Settings.CLOUD_ALARMS_PAGE_SIZE if page_size is None else page_size
+        if page_size:
+            params.update({"limit": page_size, "offset": 0})
+
         print(f"📡 [CloudAPI] Solicitando alarmas (state={state})...")
+        total = 0
+        pages = 0
+        seen_requests = set()   # (url, params) ya pedidos
+        seen_heads = set()      # primera alarma de cada página ya recibida
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
+            while url:
+                request_key = (url, tuple(sorted((params or {}).items())))
+                if request_key in seen_requests:
+                    print(f"⚠️ [CloudAPI] La paginación no avanza ({url}, {params}); se corta")
+                    break
+                if pages >= Settings.CLOUD_ALARMS_MAX_PAGES:
+                    print(f"⚠️ [CloudAPI] Alcanzado el máximo de {pages} páginas; se corta")
+                    break
+                seen_requests.add(request_key)
+                pages += 1
+
+                meta = {}
+                count = 0
+                repeated = False
+                with self.session.get(url, params=params, timeout=30, stream=True) as response:
+                    response.raise_for_status()
+                    chunks = response.iter_content(chunk_size=Settings.CLOUD_STREAM_CHUNK)
+                    for alarm in iter_json_array(chunks, meta=meta):
+                        if not count:
+                            head = json.dumps(alarm, sort_keys=True, default=str)
+                            if head in seen_heads:
+                                # Misma página otra vez: no se vuelve a entregar nada de ella
+                                repeated = True
+                                break
+                            seen_heads.add(head)
+                        count += 1
+                        yield alarm
+                total += count
+                if repeated:
+                    print(f"⚠️ [CloudAPI] Página repetida en {url}; se corta la paginación")
+                    break
+                url, params = self._next_page(url, params, meta, count, page_size)
+            print(f"📡 [CloudAPI] {total} alarmas recibidas")
         except Exception as e:
             print(f"❌ [CloudAPI Error]: {e}")
-            return []
+            if raise_errors:
+                raise
+
+    @staticmethod
+    def _next_page(url, params, meta, count, page_size):
+        """(url, params) de la siguiente página, o (None, None) si no hay más."""
+        if not count:
+            return None, None
+        next_link = meta.get("next") or meta.get("next_url")
+        if isinstance(next_link, str) and next_link.startswith("http"):
+            return next_link, None
+        cursor = meta.get("next_cursor") or meta.get("cursor")
+        if cursor:
+            return url, {**(params or {}), "cursor": cursor}
+        if page_size and params and count >= page_size:
+            return url, {**params, "offset": params.get("offset", 0) + count}
+        return None, None
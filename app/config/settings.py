@@ -5,6 +5,15 @@ from dotenv import load_dotenv
 # Carga .env buscando en la raíz del proyecto
 load_dotenv() 
 
+def _int_map(value):
+    """ "m2m=1000,boards=500" -> {"m2m": 1000, "boards": 500} (entradas mal formadas se ignoran) """
+    out = {}
+    for item in (value or "").split(","):
+        key, sep, num = item.partition("=")
+        if sep and key.strip() and num.strip().isdigit():
+            out[key.strip()] = int(num)
+    return out
+
 class Settings:
     BASE_URL = "https://core.kiconex.com/api"
     
@@ -12,8 +21,42 @@ class Settings:
     API_TOKEN = os.getenv("CORE_API_TOKEN")
     CLOUD_API_TOKEN = os.getenv("CLOUD_API_TOKEN")
     
+    # Core API: timeouts (s) de conexión y lectura, reintentos y circuit breaker por URL
+    CORE_CONNECT_TIMEOUT = float(os.getenv("CORE_CONNECT_TIMEOUT", "3.05"))
+    CORE_READ_TIMEOUT = float(os.getenv("CORE_READ_TIMEOUT", "30"))
+    CORE_RETRIES = int(os.getenv("CORE_RETRIES", "2"))
+    CORE_RETRY_BACKOFF = float(os.getenv("CORE_RETRY_BACKOFF", "0.5"))      # base del backoff exponencial (s)
+    CORE_BREAKER_FAILURE_RATE = float(os.getenv("CORE_BREAKER_FAILURE_RATE", "0.5"))
+    CORE_BREAKER_SLOW_S = float(os.getenv("CORE_BREAKER_SLOW_S", "10"))     # llamada "lenta" a partir de N s
+    CORE_BREAKER_OPEN_S = float(os.getenv("CORE_BREAKER_OPEN_S", "30"))     # tiempo abierto antes de probar de nuevo
+    # Hedging de GETs: segunda petición si la primera supera el percentil observado de la URL
+    CORE_HEDGE = os.getenv("CORE_HEDGE", "false").lower() == "true"
+    CORE_HEDGE_PERCENTILE = float(os.getenv("CORE_HEDGE_PERCENTILE", "95"))
+    CORE_HEDGE_MIN_DELAY = float(os.getenv("CORE_HEDGE_MIN_DELAY", "0.5"))  # nunca antes de N s
+    CORE_HEDGE_BUDGET = float(os.getenv("CORE_HEDGE_BUDGET", "0.05"))       # fracción máxima de peticiones con hedge
+    CORE_HEDGE_WORKERS = int(os.getenv("CORE_HEDGE_WORKERS", "16"))
+    # Recorte de campos por dataset: las URLs con proyección se decodifican en streaming.
+    # CORE_STREAM_DECODE fuerza el streaming también en el resto (más lento que orjson sobre el cuerpo entero)
+    CORE_STREAM_DECODE = os.getenv("CORE_STREAM_DECODE", "false").lower() == "true"
+    CORE_STREAM_CHUNK = int(os.getenv("CORE_STREAM_CHUNK", "65536"))
+    CORE_FIELD_PROJECTION = os.getenv("CORE_FIELD_PROJECTION", "false").lower() == "true"
+    # Entradas (url, params) que se recuerdan para GET condicional y última respuesta buena;
+    # los rangos from/to de las renovaciones crean una por consulta, así que se acota (LRU)
+    CORE_CACHE_MAX_ENTRIES = int(os.getenv("CORE_CACHE_MAX_ENTRIES", "512"))
+    # Paginación de listados (sobres Spring: totalPages / last / number)
+    CORE_PAGE_SIZE = int(os.getenv("CORE_PAGE_SIZE", "0"))                  # 0 = tamaño por defecto del servidor
+    CORE_PAGE_SIZES = _int_map(os.getenv("CORE_PAGE_SIZES", ""))            # por ruta: "m2m=1000,boards=500"
+    CORE_PAGE_WORKERS = int(os.getenv("CORE_PAGE_WORKERS", "4"))            # páginas descargadas en paralelo
+    CORE_MAX_PAGES = int(os.getenv("CORE_MAX_PAGES", "1000"))               # tope de páginas por listado
+
     # Cloud API Configuration
     CLOUD_BASE_URL = "https://cloud.kiconex.com/api/v1"
+    # Alarmas por página en /devices/alarms (0 = sin paginar, la API devuelve todo)
+    CLOUD_ALARMS_PAGE_SIZE = int(os.getenv("CLOUD_ALARMS_PAGE_SIZE", "0"))
+    # Tope de páginas por descarga (protege de una paginación que no avanza)
+    CLOUD_ALARMS_MAX_PAGES = int(os.getenv("CLOUD_ALARMS_MAX_PAGES", "1000"))
+    # Bytes por bloque al leer respuestas en streaming
+    CLOUD_STREAM_CHUNK = int(os.getenv("CLOUD_STREAM_CHUNK", "65536"))
     
     # Database Configuration
     DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -21,6 +64,43 @@ class Settings:
     DB_USER = os.getenv("DB_USER")
     DB_PASS = os.getenv("DB_PASS")
 
+    # Pool de conexiones MySQL
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))     # espera máxima por una conexión libre (s)
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # reconectar conexiones inactivas más de N s
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Acceso MySQL asíncrono (aiomysql) para los endpoints async
+    DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() == "true"
+
+    # Filas por bloque al leer devices_info en streaming
+    DB_STREAM_CHUNK = int(os.getenv("DB_STREAM_CHUNK", "1000"))
+    # Segundos que se cachean las columnas de devices_info (recoge migraciones sin reiniciar)
+    DB_SCHEMA_TTL = int(os.getenv("DB_SCHEMA_TTL", "300"))
+
+    # Extracción de campos de devices_info en MySQL (columnas generadas, ver scripts/migrate_devices_info.py)
+    INFO_DB_EXTRACT = os.getenv("INFO_DB_EXTRACT", "false").lower() == "true"
+
+    # Segundos que un snapshot procesado (renovaciones, fleet...) se reutiliza antes de refrescarlo
+    SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", "300"))
+
+    # Histórico M2M: tramos cerrados en disco, tramo del mes en curso en memoria con TTL (s)
+    M2M_HISTORY_CACHE_DIR = os.getenv("M2M_HISTORY_CACHE_DIR", "resources/m2m_history")
+    M2M_HISTORY_TTL = int(os.getenv("M2M_HISTORY_TTL", "300"))
+    M2M_HISTORY_GRACE_DAYS = int(os.getenv("M2M_HISTORY_GRACE_DAYS", "1"))              # días tras el fin de un tramo antes de congelarlo
+    M2M_HISTORY_MEMORY_SEGMENTS = int(os.getenv("M2M_HISTORY_MEMORY_SEGMENTS", "2000"))  # tramos cerrados en memoria (LRU)
+
+    # Histórico M2M en lote: SIMs en vuelo, peticiones/s al upstream (0 = sin límite) y tamaño máximo
+    M2M_BATCH_CONCURRENCY = int(os.getenv("M2M_BATCH_CONCURRENCY", "4"))
+    M2M_BATCH_RATE = float(os.getenv("M2M_BATCH_RATE", "10"))
+    M2M_BATCH_MAX_SIMS = int(os.getenv("M2M_BATCH_MAX_SIMS", "1000"))
+
+    # Almacén local de métricas (scripts/ingest_metrics.py) e intervalo de ingesta (s)
+    METRICS_STORE_DIR = os.getenv("METRICS_STORE_DIR", "resources/metrics_store")
+    METRICS_INGEST_INTERVAL = int(os.getenv("METRICS_INGEST_INTERVAL", "900"))
+
+    # Deltas que se guardan por dataset para /changes (más atrás -> resync)
+    CHANGE_FEED_DEPTH = int(os.getenv("CHANGE_FEED_DEPTH", "50"))
+
     DEFAULT_TENANT_UUID = "90be8c8a-f462-4a3e-afcf-d8f34094eaa8" 
 
     # ENDPOINTS
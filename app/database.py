@@ -1,22 +1,180 @@
+import threading
+import time
+from datetime import datetime
+
 import mysql.connector
+from mysql.connector import pooling, errorcode
 from app.config.settings import Settings
+from app import alarm_rollups
+
+# Columnas generadas (STORED) sobre devices_info.info: (nombre, ruta JSON, tipo SQL)
+# Las crea scripts/migrate_devices_info.py
+INFO_GENERATED_COLUMNS = [
+    ("quiiotd_version",  "$.quiiotd_version",  "VARCHAR(64)"),
+    ("compilation_date", "$.compilation_date", "VARCHAR(10)"),
+    ("board_model",      "$.board_model",      "VARCHAR(128)"),
+    ("osname",           "$.osname",           "VARCHAR(128)"),
+    ("osversion",        "$.osversion",        "VARCHAR(128)"),
+    ("api_version",      "$.api_version",      "VARCHAR(64)"),
+    ("uptime",           "$.uptime",           "VARCHAR(64)"),
+    ("free_ram_mb",      "$.free_ram",         "DOUBLE"),
+    ("sys_temp_c",       "$.sys_temp",         "DOUBLE"),
+    ("free_size_mb",     "$.free_size",        "DOUBLE"),
+    ("info_epoch",       "$.timestamp",        "DOUBLE"),
+    ("interfaces_json",  "$.interfaces",       "JSON"),
+]
+
+# Columnas generadas con índice (las que se usan para filtrar)
+INFO_INDEXED_COLUMNS = ["quiiotd_version", "compilation_date", "board_model"]
+
+class PoolMetrics:
+    """Contadores del pool: espera por conexión, uso y reciclados."""
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.in_use_peak = 0
+        self.recycled = 0
+        self.ping_failures = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+
+    def checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def count(self, name):
+        """Suma 1 a un contador simple (recycled, ping_failures, timeouts)."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self.in_use,
+                "in_use_peak": self.in_use_peak,
+                "utilization": round(self.in_use / self.pool_size, 3) if self.pool_size else 0.0,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "recycled": self.recycled,
+                "ping_failures": self.ping_failures,
+                "c_extension": bool(getattr(mysql.connector, "HAVE_CEXT", False)),
+            }
+
+
+class _PooledConnection:
+    """
+    Conexión prestada por el pool. close() la devuelve al pool y libera el hueco,
+    así el código existente (conn.close() en finally) no cambia.
+    """
+
+    def __init__(self, conn, adapter):
+        self._conn = conn
+        self._adapter = adapter
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._adapter._release(self._conn)
+
 
 class DatabaseAdapter:
-    def __init__(self):
+    def __init__(self, pool_size=None):
         self.config = {
             'host': Settings.DB_HOST,
             'database': Settings.DB_NAME,
             'user': Settings.DB_USER,
-            'password': Settings.DB_PASS
+            'password': Settings.DB_PASS,
+            # Extensión C (_mysql_connector) si está instalada; si no, implementación pura
+            'use_pure': not getattr(mysql.connector, "HAVE_CEXT", False),
         }
-    
+        self.pool_size = max(1, min(pool_size or Settings.DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE))
+        self.metrics = PoolMetrics(self.pool_size)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._last_used = {}  # id(conexión física) -> time.monotonic() de su última devolución
+        self._info_columns = None     # columnas de devices_info (caché con TTL)
+        self._info_columns_at = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=f"dashboard_{id(self)}",
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        **self.config
+                    )
+        return self._pool
+
+    def _prepare(self, conn):
+        """Recicla conexiones inactivas demasiado tiempo y hace pre-ping antes de entregarlas."""
+        raw = getattr(conn, "_cnx", conn)
+        last_used = self._last_used.get(id(raw))
+        if last_used is not None and time.monotonic() - last_used > Settings.DB_POOL_RECYCLE:
+            conn.reconnect(attempts=2, delay=0)
+            self.metrics.count("recycled")
+        elif Settings.DB_POOL_PRE_PING:
+            try:
+                conn.ping(reconnect=True, attempts=2, delay=0)
+            except mysql.connector.Error:
+                self.metrics.count("ping_failures")
+                raise
+
+    def _release(self, conn):
+        raw = getattr(conn, "_cnx", conn)
+        try:
+            conn.close()
+        finally:
+            if raw is not None:
+                self._last_used[id(raw)] = time.monotonic()
+            self.metrics.checkin()
+            self._slots.release()
+
     def get_connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=Settings.DB_POOL_TIMEOUT):
+            self.metrics.count("timeouts")
+            err = mysql.connector.errors.PoolError(
+                f"Sin conexiones libres en el pool tras {Settings.DB_POOL_TIMEOUT}s"
+            )
+            print(f"❌ Error al conectar a la Base de Datos: {err}")
+            raise err
         try:
-            conn = mysql.connector.connect(**self.config)
-            return conn
+            conn = self._get_pool().get_connection()
+            self._prepare(conn)
         except mysql.connector.Error as err:
+            if 'conn' in locals():
+                conn.close()
+            self._slots.release()
             print(f"❌ Error al conectar a la Base de Datos: {err}")
             raise err
+        self.metrics.checkout(time.perf_counter() - start)
+        return _PooledConnection(conn, self)
+
+    def pool_stats(self):
+        return self.metrics.snapshot()
 
     def execute_query(self, query, values=None):
         conn = self.get_connection()
@@ -68,6 +226,111 @@ class DatabaseAdapter:
             if 'cursor' in locals(): cursor.close()
             if 'conn' in locals(): conn.close()
 
+    def save_alarm_counts(self, stats, ts=None):
+        """
+        Inserta una muestra en alarm_counts y después la acumula en los rollups
+        horario/diario/mensual. La muestra cruda se confirma primero: los rollups
+        son un paso aparte y best-effort (p. ej. si aún no se ha ejecutado
+        scripts/migrate_alarm_rollups.py), así que su fallo no la pierde.
+        """
+        ts = ts or datetime.now()
+        insert = """
+            INSERT INTO alarm_counts
+            (disconnected_device, disconnected_control, parameters, sim_high, sim_critical, timestamp)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        values = tuple(stats.get(c, 0) for c in alarm_rollups.ALARM_COUNTERS) + (ts,)
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(insert, values)
+            conn.commit()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al guardar contadores de alarmas: {err}")
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            raise err
+
+        try:
+            for bucket in alarm_rollups.ROLLUP_TABLES:
+                cursor.execute(
+                    alarm_rollups.upsert_statement(bucket),
+                    alarm_rollups.upsert_values(stats, ts, bucket),
+                )
+            conn.commit()
+        except mysql.connector.Error as err:
+            conn.rollback()
+            if err.errno == errorcode.ER_NO_SUCH_TABLE:
+                print("⚠️ Tablas de rollup inexistentes (ejecuta scripts/migrate_alarm_rollups.py); solo se guarda la muestra")
+            else:
+                print(f"⚠️ Error al actualizar rollups de alarmas (la muestra sí se guardó): {err}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_alarm_history_range(self, start, end, bucket="auto", max_points=500):
+        """
+        Histórico de alarm_counts en [start, end) a la resolución pedida,
+        leído de la tabla de rollup más gruesa que la satisface.
+        """
+        bucket = alarm_rollups.choose_bucket(start, end, bucket, max_points)
+        query, _ = alarm_rollups.range_query(bucket)
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, alarm_rollups.range_bounds(start, end, bucket))
+            rows = cursor.fetchall()
+            return {"bucket": bucket, "data": alarm_rollups.format_rows(rows, bucket)}
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar histórico por rango: {err}")
+            return {"bucket": bucket, "data": []}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'conn' in locals(): conn.close()
+
+    def save_alarm_breakdown(self, breakdown, ts=None):
+        """
+        Persiste el desglose {(organización, modelo, categoría): n} en el bucket horario
+        de ts (upsert: la última foto de cada hora sustituye a las anteriores).
+        """
+        ts = ts or datetime.now()
+        rows = alarm_rollups.breakdown_values(breakdown, ts)
+        query = alarm_rollups.breakdown_upsert_statement()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(query, rows)
+            conn.commit()
+            return len(rows)
+        except mysql.connector.Error as err:
+            print(f"❌ Error al guardar desglose de alarmas: {err}")
+            conn.rollback()
+            raise err
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_latest_breakdown(self):
+        """Filas de la última foto del desglose de alarmas (snapshot_ts más reciente)."""
+        query = f"""
+            SELECT snapshot_ts, organization, model, category, count
+            FROM {alarm_rollups.BREAKDOWN_TABLE}
+            WHERE snapshot_ts = (SELECT MAX(snapshot_ts) FROM {alarm_rollups.BREAKDOWN_TABLE})
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query)
+            return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar desglose de alarmas: {err}")
+            return []
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'conn' in locals(): conn.close()
+
     def get_all_device_info(self):
         query = "SELECT * FROM devices_info"
         try:
@@ -82,3 +345,135 @@ class DatabaseAdapter:
         finally:
             if 'cursor' in locals(): cursor.close()
             if 'conn' in locals(): conn.close()
+
+
+    def device_info_columns(self):
+        """
+        Columnas reales de devices_info. Se cachean DB_SCHEMA_TTL segundos para
+        recoger migraciones posteriores; un error de BD se propaga sin cachear nada.
+        """
+        if self._info_columns is None or time.monotonic() - self._info_columns_at > Settings.DB_SCHEMA_TTL:
+            try:
+                conn = self.get_connection()
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SHOW COLUMNS FROM devices_info")
+                self._info_columns = [row["Field"] for row in cursor.fetchall()]
+                self._info_columns_at = time.monotonic()
+            finally:
+                if 'cursor' in locals(): cursor.close()
+                if 'conn' in locals(): conn.close()
+        return self._info_columns
+
+    def invalidate_device_info_columns(self):
+        """Olvida las columnas cacheadas (p. ej. tras un error de consulta o una migración)."""
+        self._info_columns = None
+
+    def device_info_projection(self):
+        """
+        Proyección con las columnas generadas en lugar del blob 'info'.
+        None si la migración (scripts/migrate_devices_info.py) no se ha aplicado
+        o si no se puede consultar el esquema.
+        """
+        try:
+            existing = self.device_info_columns()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar columnas de devices_info: {err}")
+            return None
+        if any(name not in existing for name, _, _ in INFO_GENERATED_COLUMNS):
+            return None
+        return [c for c in existing if c != "info"]
+
+    def _select_device_info(self, columns):
+        existing = self.device_info_columns()
+        columns = columns or existing
+        unknown = [c for c in columns if c not in existing]
+        if unknown:
+            raise ValueError(f"Columnas desconocidas en devices_info: {unknown}")
+        return "SELECT " + ", ".join(f"`{c}`" for c in columns) + " FROM devices_info"
+
+    def get_device_info_projected(self):
+        """
+        Lee devices_info usando las columnas generadas en lugar del blob 'info'.
+        Devuelve None si la migración no se ha aplicado (el llamador debe caer al modo Python).
+        """
+        try:
+            columns = self.device_info_projection()
+            if columns is None:
+                return None
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(self._select_device_info(columns))
+            return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar devices_info (columnas generadas): {err}")
+            self.invalidate_device_info_columns()
+            return None
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'conn' in locals(): conn.close()
+
+    def get_device_info_page(self, after_id=None, limit=1000, columns=None):
+        """
+        Paginación por clave: filas con id > after_id, ordenadas por id.
+        'columns' limita la proyección (por defecto todas).
+        """
+        try:
+            query = self._select_device_info(columns)
+            if after_id is not None:
+                query += " WHERE id > %s ORDER BY id LIMIT %s"
+                values = (after_id, limit)
+            else:
+                query += " ORDER BY id LIMIT %s"
+                values = (limit,)
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, values)
+            return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar página de devices_info: {err}")
+            self.invalidate_device_info_columns()
+            return []
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'conn' in locals(): conn.close()
+
+    def iter_device_info(self, columns=None, chunk_size=1000):
+        """
+        Generador de bloques de filas de devices_info con cursor sin buffer:
+        nunca hay más de chunk_size filas en memoria de Python.
+        La conexión queda ocupada hasta que se consume (o se cierra) el generador.
+        Si la BD no responde al empezar no genera nada (como get_all_device_info);
+        un fallo a mitad de lectura sí se propaga, para no dar la tabla por completa.
+        """
+        try:
+            query = self._select_device_info(columns)
+            conn = self.get_connection()
+        except mysql.connector.Error as err:
+            print(f"❌ Error al consultar devices_info: {err}")
+            self.invalidate_device_info_columns()
+            return
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            try:
+                cursor.execute(query)
+            except mysql.connector.Error as err:
+                print(f"❌ Error al consultar devices_info: {err}")
+                self.invalidate_device_info_columns()
+                return
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except mysql.connector.Error as err:
+            print(f"❌ Error leyendo devices_info en streaming: {err}")
+            raise err
+        finally:
+            try:
+                # Un cursor sin buffer debe vaciarse antes de devolver la conexión
+                if conn.unread_result:
+                    conn.get_rows()
+            except mysql.connector.Error:
+                pass
+            cursor.close()
+            conn.close()
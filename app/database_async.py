@@ -0,0 +1,166 @@
+# Archivo: app/database_async.py
+import time
+
+try:
+    import aiomysql
+except ImportError:  # Dependencia opcional: sin ella se usa DatabaseAdapter en el threadpool
+    aiomysql = None
+
+from app.config.settings import Settings
+from app import alarm_rollups
+from app.database import INFO_GENERATED_COLUMNS
+
+
+class AsyncDatabaseAdapter:
+    """
+    Versión asyncio de DatabaseAdapter (aiomysql) con los mismos métodos como corrutinas.
+    El pool lo abre y cierra el lifespan de FastAPI; mientras no esté abierto, is_open es False
+    y los endpoints caen al adaptador síncrono.
+    """
+
+    def __init__(self, pool_size=None):
+        self.config = {
+            'host': Settings.DB_HOST,
+            'db': Settings.DB_NAME,
+            'user': Settings.DB_USER,
+            'password': Settings.DB_PASS,
+        }
+        self.pool_size = max(1, pool_size or Settings.DB_POOL_SIZE)
+        self._pool = None
+        self._info_columns = None     # columnas de devices_info (caché con TTL)
+        self._info_columns_at = 0.0
+
+    @property
+    def is_open(self):
+        return self._pool is not None
+
+    async def open(self):
+        if aiomysql is None:
+            raise RuntimeError("aiomysql no está instalado")
+        if self._pool is None:
+            self._pool = await aiomysql.create_pool(
+                minsize=1,
+                maxsize=self.pool_size,
+                # Las conexiones caducadas se renuevan por pool_recycle (sin ping por consulta)
+                pool_recycle=Settings.DB_POOL_RECYCLE,
+                # Autocommit: una lectura no deja la conexión en transacción, así que el pool
+                # la reutiliza (aiomysql cierra al liberar las que siguen en transacción)
+                autocommit=True,
+                **self.config
+            )
+            print(f"🔌 Pool MySQL async abierto (max {self.pool_size} conexiones)")
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+            print("🔌 Pool MySQL async cerrado")
+
+    async def _fetch(self, query, values=None, one=False):
+        async with self._pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, values)
+                return await (cursor.fetchone() if one else cursor.fetchall())
+
+    async def execute_query(self, query, values=None):
+        async with self._pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(query, values)
+                    await conn.commit()
+                    return cursor.rowcount
+                except aiomysql.Error as err:
+                    print(f"❌ Error en la consulta: {err}")
+                    await conn.rollback()
+                    raise err
+
+    async def get_latest_counts(self):
+        try:
+            return await self._fetch("SELECT * FROM alarm_counts ORDER BY id DESC LIMIT 1", one=True)
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar últimos contadores: {err}")
+            return None
+
+    async def get_history_counts(self, limit=50):
+        try:
+            result = await self._fetch("SELECT * FROM alarm_counts ORDER BY id DESC LIMIT %s", (limit,))
+            # Devolver en orden cronológico (ascendente)
+            return list(reversed(result))
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar histórico: {err}")
+            return []
+
+    async def get_alarm_history_range(self, start, end, bucket="auto", max_points=500):
+        bucket = alarm_rollups.choose_bucket(start, end, bucket, max_points)
+        query, _ = alarm_rollups.range_query(bucket)
+        try:
+            rows = await self._fetch(query, alarm_rollups.range_bounds(start, end, bucket))
+            return {"bucket": bucket, "data": alarm_rollups.format_rows(rows, bucket)}
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar histórico por rango: {err}")
+            return {"bucket": bucket, "data": []}
+
+    async def get_latest_breakdown(self):
+        query = f"""
+            SELECT snapshot_ts, organization, model, category, count
+            FROM {alarm_rollups.BREAKDOWN_TABLE}
+            WHERE snapshot_ts = (SELECT MAX(snapshot_ts) FROM {alarm_rollups.BREAKDOWN_TABLE})
+        """
+        try:
+            return await self._fetch(query)
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar desglose de alarmas: {err}")
+            return []
+
+    async def get_all_device_info(self):
+        try:
+            return await self._fetch("SELECT * FROM devices_info")
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar devices_info: {err}")
+            return []
+
+    async def device_info_columns(self):
+        if self._info_columns is None or time.monotonic() - self._info_columns_at > Settings.DB_SCHEMA_TTL:
+            rows = await self._fetch("SHOW COLUMNS FROM devices_info")
+            self._info_columns = [row["Field"] for row in rows]
+            self._info_columns_at = time.monotonic()
+        return self._info_columns
+
+    def invalidate_device_info_columns(self):
+        self._info_columns = None
+
+    async def device_info_projection(self):
+        try:
+            existing = await self.device_info_columns()
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar columnas de devices_info: {err}")
+            return None
+        if any(name not in existing for name, _, _ in INFO_GENERATED_COLUMNS):
+            return None
+        return [c for c in existing if c != "info"]
+
+    async def get_device_info_page(self, after_id=None, limit=1000, columns=None):
+        try:
+            existing = await self.device_info_columns()
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar página de devices_info: {err}")
+            return []
+        columns = columns or existing
+        unknown = [c for c in columns if c not in existing]
+        if unknown:
+            raise ValueError(f"Columnas desconocidas en devices_info: {unknown}")
+
+        query = "SELECT " + ", ".join(f"`{c}`" for c in columns) + " FROM devices_info"
+        if after_id is not None:
+            query += " WHERE id > %s ORDER BY id LIMIT %s"
+            values = (after_id, limit)
+        else:
+            query += " ORDER BY id LIMIT %s"
+            values = (limit,)
+        try:
+            return await self._fetch(query, values)
+        except aiomysql.Error as err:
+            print(f"❌ Error al consultar página de devices_info: {err}")
+            self.invalidate_device_info_columns()
+            return []
@@ -0,0 +1,124 @@
+# Archivo: app/hedging.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+
+class RequestCancelled(Exception):
+    """Intento perdedor de una petición con hedge: su resultado ya no hace falta."""
+
+
+class LatencyTracker:
+    """Latencias recientes por URL para calcular el umbral de hedge (percentil)."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append(seconds)
+
+    def percentile(self, key, q):
+        """Percentil q de la URL, o None si aún no hay muestras suficientes."""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.percentile(samples, q))
+
+
+class HedgeBudget:
+    """
+    Limita los hedges a un porcentaje del tráfico (ventana de las últimas
+    `window` peticiones) para no multiplicar la carga durante una caída.
+    """
+
+    def __init__(self, ratio=0.05, window=1000):
+        self.ratio = ratio
+        self._events = deque(maxlen=window)   # una marca por petición: [True] = hubo hedge
+        self._lock = threading.Lock()
+
+    def request(self):
+        """Registra una petición y devuelve su marca (se pasa a try_spend)."""
+        slot = [False]
+        with self._lock:
+            self._events.append(slot)
+        return slot
+
+    def try_spend(self, slot):
+        """Gasta un hedge para la petición `slot` si el presupuesto lo permite."""
+        with self._lock:
+            hedges = sum(1 for s in self._events if s[0])
+            if hedges + 1 > self.ratio * max(len(self._events), 1):
+                return False
+            # Se marca la petición propia, no la última registrada (otro hilo puede haber entrado)
+            slot[0] = True
+            return True
+
+
+def hedged_call(executor, attempt, delay, budget, on_hedge=None):
+    """
+    Ejecuta attempt(cancel_event) y, si no ha terminado `delay` segundos después
+    de empezar a ejecutarse y el presupuesto lo permite, lanza un segundo intento
+    idéntico. El tiempo en cola del executor no cuenta: un pool saturado no es un
+    upstream lento. Gana la primera respuesta correcta; al perdedor se le marca
+    cancel_event para que suelte la conexión. Si el primero que termina falla,
+    se espera al otro.
+    """
+    slot = budget.request()
+    cancels = [threading.Event()]
+    started = threading.Event()
+
+    def _first(cancel):
+        started.set()
+        return attempt(cancel)
+
+    futures = [executor.submit(_first, cancels[0])]
+    started.wait()
+
+    done, _ = wait(futures, timeout=delay)
+    if not done and budget.try_spend(slot):
+        if on_hedge:
+            on_hedge()
+        cancels.append(threading.Event())
+        futures.append(executor.submit(attempt, cancels[1]))
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            for i, other in enumerate(futures):
+                if other is not future:
+                    cancels[i].set()
+                    other.cancel()
+            return result
+    raise error
+
+
+def timed(tracker, key, fn):
+    """Envuelve fn(cancel) registrando la latencia de cada intento completado."""
+    def _run(cancel):
+        started = time.monotonic()
+        try:
+            result = fn(cancel)
+        except RequestCancelled:
+            # El perdedor también cuenta: si no, el percentil solo vería a los rápidos
+            tracker.record(key, time.monotonic() - started)
+            raise
+        tracker.record(key, time.monotonic() - started)
+        return result
+    return _run
@@ -0,0 +1,152 @@
+# Archivo: app/json_stream.py
+import codecs
+import json
+
+# Claves habituales en las que una API envuelve el listado ({"data": [...], "next": ...})
+ENVELOPE_KEYS = ("data", "content", "items", "results", "alarms", "records")
+
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+class _TextBuffer:
+    """Texto decodificado de forma incremental a partir de bloques de bytes."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_chars=1):
+        """
+        Añade bloques al buffer hasta tener al menos min_chars nuevos.
+        Devuelve False si ya no hay más.
+        """
+        if self.eof:
+            return False
+        # Descartar lo ya consumido para que el buffer no crezca con la respuesta
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        pieces = []
+        added = 0
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            piece = self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if piece:
+                pieces.append(piece)
+                added += len(piece)
+                if added >= min_chars:
+                    self.text += "".join(pieces)
+                    return True
+        pieces.append(self._utf8.decode(b"", final=True))
+        self.text += "".join(pieces)
+        self.eof = True
+        return added > 0
+
+    def peek(self):
+        """Siguiente carácter no blanco (sin consumirlo), o '' al final."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON inesperado: se esperaba '{char}' en la posición {self.pos}")
+        self.pos += 1
+
+    def value(self, decoder):
+        """Decodifica un valor JSON completo, leyendo más bloques si está partido."""
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Valor partido: al menos duplicar lo pendiente antes de reintentar,
+                # así un valor grande no se re-parsea una vez por bloque
+                if self.fill(min_chars=len(self.text) - self.pos):
+                    continue
+                raise
+            # Un número cortado por el bloque ("4." de "4.5") se decodifica a medias:
+            # confirmar con más datos si el valor llega al final o lo sigue un carácter numérico
+            if not self.eof and (end == len(self.text) or self.text[end] in _NUMBER_CHARS) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _keyed_decoder():
+    """
+    Decodificador que reutiliza las claves entre elementos. json.loads comparte las
+    claves repetidas dentro de una llamada, pero aquí cada elemento es una llamada
+    distinta: sin esta caché cada registro tendría su propia copia de cada clave.
+    """
+    keys = {}
+
+    def pairs_to_dict(pairs):
+        return {keys.setdefault(k, k): v for k, v in pairs}
+
+    return json.JSONDecoder(object_pairs_hook=pairs_to_dict)
+
+
+def _iter_array(buf, decoder, project=None):
+    buf.expect("[")
+    if buf.peek() == "]":
+        buf.pos += 1
+        return
+    while True:
+        item = buf.value(decoder)
+        yield project(item) if project else item
+        sep = buf.peek()
+        buf.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError(f"JSON inesperado: se esperaba ',' o ']' en la posición {buf.pos - 1}")
+
+
+def iter_json_array(chunks, envelope_keys=ENVELOPE_KEYS, meta=None, project=None):
+    """
+    Genera los elementos de un array JSON a medida que llegan los bloques
+    (bytes o str), sin cargar la respuesta entera en memoria.
+
+    Acepta un array en la raíz o un objeto que lo envuelva bajo alguna de
+    envelope_keys; el resto de campos del objeto (cursor, total, next...) se
+    copian en `meta` si se pasa un dict (disponibles al agotar el generador).
+    `project`, si se indica, se aplica a cada elemento antes de entregarlo.
+    """
+    decoder = _keyed_decoder()
+    buf = _TextBuffer(chunks)
+
+    first = buf.peek()
+    if first == "[":
+        yield from _iter_array(buf, decoder, project)
+        return
+    if first != "{":
+        raise ValueError("JSON inesperado: se esperaba un array o un objeto")
+
+    buf.expect("{")
+    if buf.peek() == "}":
+        buf.pos += 1
+        return
+    while True:
+        key = buf.value(decoder)
+        buf.expect(":")
+        if key in envelope_keys and buf.peek() == "[":
+            yield from _iter_array(buf, decoder, project)
+        else:
+            value = buf.value(decoder)
+            if meta is not None:
+                meta[key] = value
+        sep = buf.peek()
+        buf.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError(f"JSON inesperado: se esperaba ',' o '}}' en la posición {buf.pos - 1}")
@@ -265,4 +265,28 @@ def prepare_kiwi(data, df_models=None, df_soft=None):
     df = df.astype(object)
     df = df.where(pd.notnull(df), None)
 
-    return df
\ No newline at end of file
+    return df
+
+# -------------------------------------------------------------------------
+# ÍNDICE UUID → (ORGANIZACIÓN, MODELO)
+# -------------------------------------------------------------------------
+def build_device_index(raw_devices, raw_models=None, raw_software=None, raw_kiwi=None):
+    """
+    Diccionario uuid (normalizado) → {"organization", "model"} para cruces rápidos
+    (p.ej. alarmas por cliente y modelo). Organización vía normalize_organization
+    y modelo vía la cadena software → modelo de prepare_boards/prepare_kiwi.
+    """
+    df_models = pd.DataFrame(raw_models or [])
+    df_soft = pd.DataFrame(raw_software or [])
+
+    index = {}
+    frames = [
+        prepare_boards(raw_devices or [], df_models=df_models, df_soft=df_soft.copy()),
+        prepare_kiwi(raw_kiwi or [], df_soft=df_soft.copy()),
+    ]
+    for df in frames:
+        if df is None or df.empty or "uuid" not in df.columns:
+            continue
+        for uuid, org, model in zip(_clean_uuid(df["uuid"]), df["organization"], df["model"]):
+            index.setdefault(uuid, {"organization": org or "SIN ASIGNAR", "model": model or "Desconocido"})
+    return index
@@ -0,0 +1,183 @@
+# Archivo: app/logic/data_fleet.py
+import pandas as pd
+
+from app.logic.search_index import SearchIndex
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _uuid_key(val):
+    if val is None:
+        return None
+    s = str(val).strip().lower()
+    return s if s and s not in ("none", "nan") else None
+
+def _icc_key(val):
+    if val is None:
+        return None
+    s = str(val).strip()
+    return s if s and s not in ("None", "nan", "N/A") else None
+
+def _records(df):
+    """DataFrame procesado → lista de dicts sin NaN."""
+    if df is None or len(df) == 0:
+        return []
+    df = df.astype(object).where(pd.notnull(df), None)
+    return df.to_dict(orient="records")
+
+def _pick(record, mapping):
+    """Copia los campos de 'record' renombrados según mapping {origen: destino}."""
+    return {dst: (record.get(src) if record else None) for src, dst in mapping.items()}
+
+# Campos que aporta cada fuente al registro de fleet
+_DEVICE_FIELDS = ["uuid", "name", "model", "organization", "final_client", "status_clean"]
+
+_SIM_FIELDS = {
+    "status_clean":     "sim_status",
+    "rate_plan":        "sim_rate_plan",
+    "network_type":     "sim_network_type",
+    "country_code":     "sim_country_code",
+    "cons_month_mb":    "sim_cons_month_mb",
+    "usage_tier_month": "sim_usage_tier_month",
+    "alarm_count":      "sim_alarm_count",
+}
+
+_INST_FIELDS = {
+    "state":            "inst_state",
+    "enabled":          "inst_enabled",
+    "last_change":      "inst_last_change",
+    "first_connection": "inst_first_connection",
+}
+
+_M2M_REN_FIELDS = {
+    "date_to_renew":    "m2m_renewal_date",
+    "state_label":      "m2m_renewal_state",
+    "m2m_name":         "m2m_name",
+}
+
+_PLAN_REN_FIELDS = {
+    "date_to_renew":        "plan_renewal_date",
+    "state_label":          "plan_renewal_state",
+    "ki_subscription_name": "plan_name",
+}
+
+
+def _renewals_by_uuid(renewals, today):
+    """
+    Una renovación por uuid: la próxima (date_to_renew >= hoy) y, si no hay,
+    la más reciente ya pasada. Las fechas vienen en YYYY-MM-DD (comparables como str).
+    """
+    upcoming, past = {}, {}
+    for rec in renewals or []:
+        key = _uuid_key(rec.get("uuid"))
+        date = rec.get("date_to_renew")
+        if key is None or not date:
+            continue
+        if date >= today:
+            if key not in upcoming or date < upcoming[key].get("date_to_renew"):
+                upcoming[key] = rec
+        elif key not in past or date > past[key].get("date_to_renew"):
+            past[key] = rec
+    past.update(upcoming)
+    return past
+
+
+# ----------------------------
+# Vista unificada
+# ----------------------------
+class FleetIndex:
+    """
+    Vista unificada dispositivo ↔ SIM ↔ instalación ↔ renovaciones.
+    Se construye una vez por refresco; las consultas puntuales por uuid o ICC
+    se resuelven con los índices hash (dict) en O(1).
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._search = None
+        self.by_uuid = {}
+        self.by_icc = {}
+        for rec in records:
+            if rec.get("uuid"):
+                self.by_uuid[rec["uuid"]] = rec
+            if rec.get("icc"):
+                self.by_icc[rec["icc"]] = rec
+
+    def __len__(self):
+        return len(self.records)
+
+    def search_index(self):
+        """Índice de búsqueda de este snapshot (se construye la primera vez que se usa)."""
+        if self._search is None:
+            self._search = SearchIndex(self.records)
+        return self._search
+
+    def get(self, uuid):
+        return self.by_uuid.get(_uuid_key(uuid))
+
+    def get_by_icc(self, icc):
+        return self.by_icc.get(_icc_key(icc))
+
+    def filter(self, organization=None, model=None, status=None, device_type=None, has_sim=None):
+        out = self.records
+        if organization:
+            org = organization.strip().upper()
+            out = [r for r in out if (r.get("organization") or "").upper() == org]
+        if model:
+            out = [r for r in out if r.get("model") == model]
+        if status:
+            out = [r for r in out if r.get("status_clean") == status]
+        if device_type:
+            out = [r for r in out if r.get("device_type") == device_type]
+        if has_sim is not None:
+            out = [r for r in out if bool(r.get("icc")) == has_sim]
+        return out
+
+
+def build_fleet(df_boards, df_kiwi, df_m2m, df_inst, m2m_renewals, plan_renewals, today=None):
+    """
+    Cruza los datasets ya procesados (prepare_boards, prepare_kiwi, process_m2m,
+    process_installations y las renovaciones) por uuid/ICC normalizados.
+    El ICC de cada dispositivo sale del propio registro o, si no lo trae,
+    de su renovación M2M (uuid → icc).
+    """
+    today = today or pd.Timestamp.now().strftime("%Y-%m-%d")
+
+    sims = {}
+    for rec in _records(df_m2m):
+        key = _icc_key(rec.get("icc"))
+        if key:
+            sims[key] = rec
+
+    installations = {}
+    for rec in _records(df_inst):
+        key = _uuid_key(rec.get("uuid"))
+        if key:
+            installations[key] = rec
+
+    m2m_ren = _renewals_by_uuid(m2m_renewals, today)
+    plan_ren = _renewals_by_uuid(plan_renewals, today)
+
+    records = []
+    seen = set()
+    for device_type, df in (("board", df_boards), ("kiwi", df_kiwi)):
+        for dev in _records(df):
+            key = _uuid_key(dev.get("uuid"))
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+
+            ren_m2m = m2m_ren.get(key)
+            icc = _icc_key(dev.get("icc")) or _icc_key(ren_m2m.get("icc") if ren_m2m else None)
+
+            rec = {field: dev.get(field) for field in _DEVICE_FIELDS}
+            rec["uuid"] = key
+            rec["device_type"] = device_type
+            rec["icc"] = icc
+            rec.update(_pick(sims.get(icc) if icc else None, _SIM_FIELDS))
+            rec.update(_pick(installations.get(key), _INST_FIELDS))
+            rec.update(_pick(ren_m2m, _M2M_REN_FIELDS))
+            rec.update(_pick(plan_ren.get(key), _PLAN_REN_FIELDS))
+            records.append(rec)
+
+    return FleetIndex(records)
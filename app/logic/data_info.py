@@ -1,6 +1,8 @@
 import pandas as pd
 import json
 import math
+import hashlib
+import threading
 from datetime import datetime, timezone
 
 
@@ -143,6 +145,52 @@ def compute_update_status(date_str):
         return "Desconocido"
 
 
+# Columnas que devuelve DatabaseAdapter.get_device_info_projected (columnas generadas en MySQL)
+INFO_DB_COLUMNS = [
+    "quiiotd_version",
+    "compilation_date",
+    "board_model",
+    "osname",
+    "osversion",
+    "api_version",
+    "uptime",
+    "free_ram_mb",
+    "sys_temp_c",
+    "free_size_mb",
+    "info_epoch",
+    "interfaces_json",
+]
+
+
+def _interfaces_from_db(val):
+    """interfaces_json llega como str/bytes (JSON) o ya decodificado como lista."""
+    if isinstance(val, (bytes, bytearray)):
+        val = val.decode("utf-8", "replace")
+    if isinstance(val, str):
+        try:
+            val = json.loads(val)
+        except ValueError:
+            return None
+    return extract_interfaces({"interfaces": val}) if isinstance(val, list) else None
+
+
+def _from_db_columns(df):
+    """Completa las columnas normalizadas a partir de los campos ya extraídos por MySQL."""
+    df["compilation_date"] = df["compilation_date"].apply(
+        lambda v: str(v).split(" ")[0].split("T")[0] if v else None
+    )
+    df["update_status"]    = df["compilation_date"].apply(compute_update_status)
+
+    for col in ["free_ram_mb", "sys_temp_c", "free_size_mb"]:
+        df[col] = df[col].apply(_safe_float)
+
+    df["info_timestamp"]   = df["info_epoch"].apply(_epoch_to_iso)
+    df["interfaces"]       = df["interfaces_json"].apply(_interfaces_from_db)
+
+    df = df.drop(columns=["info_epoch", "interfaces_json"])
+    return df.astype(object).where(pd.notnull(df), None)
+
+
 def process_devicesInfo(json_data, info_column_name='info'):
     """Procesa JSON crudo y añade columnas normalizadas."""
     if not json_data:
@@ -150,6 +198,10 @@ def process_devicesInfo(json_data, info_column_name='info'):
 
     df = pd.DataFrame(json_data)
 
+    # Modo BD: MySQL ya ha extraído los campos, no hace falta parsear 'info'
+    if "info" not in df.columns and all(c in df.columns for c in INFO_DB_COLUMNS):
+        return _from_db_columns(df)
+
     if "info" not in df.columns:
         df["info"] = None
         df["quiiotd_version"]  = None
@@ -177,4 +229,172 @@ def process_devicesInfo(json_data, info_column_name='info'):
     # Limpiar NaN residuales
     df = df.astype(object).where(pd.notnull(df), None)
 
-    return df.drop(columns=["info_json"], errors="ignore")
\ No newline at end of file
+    return df.drop(columns=["info_json"], errors="ignore")
+
+
+# ================================
+# CACHÉ INCREMENTAL (id + hash del info)
+# ================================
+
+# Columnas que process_devicesInfo deriva del campo 'info'
+INFO_DERIVED_COLUMNS = [
+    "quiiotd_version",
+    "compilation_date",
+    "update_status",
+    "board_model",
+    "osname",
+    "osversion",
+    "api_version",
+    "uptime",
+    "free_ram_mb",
+    "sys_temp_c",
+    "free_size_mb",
+    "info_timestamp",
+    "interfaces",
+]
+
+
+def _info_digest(raw):
+    """Hash estable del contenido de 'info' (str, bytes o dict)."""
+    if raw is None:
+        return None
+    if isinstance(raw, dict):
+        raw = json.dumps(raw, sort_keys=True, default=str)
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8", "surrogatepass")
+    if not isinstance(raw, (bytes, bytearray)):
+        raw = str(raw).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class DeviceInfoCache:
+    """
+    Caché incremental de process_devicesInfo.
+    Guarda las columnas derivadas de cada dispositivo junto al hash de su 'info':
+    en cada llamada solo se re-parsean las filas nuevas o cuyo 'info' ha cambiado,
+    el resto se reutiliza de la ejecución anterior.
+    """
+
+    KEY_CANDIDATES = ("id", "uuid", "device_uuid")
+
+    def __init__(self):
+        self._entries = {}  # clave -> (digest, dict de columnas derivadas)
+        self._lock = threading.Lock()
+        self.last_stats = {"total": 0, "reprocessed": 0}
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def _key_column(self, row):
+        for col in self.KEY_CANDIDATES:
+            if col in row:
+                return col
+        return None
+
+    def _process_rows(self, rows, previous, keep_info=True):
+        """
+        Procesa un bloque de filas usando 'previous' como caché.
+        Devuelve (DataFrame, entradas del bloque, nº de filas reprocesadas).
+        """
+        first = rows[0] if isinstance(rows[0], dict) else {}
+        key_col = self._key_column(first)
+
+        # Sin clave estable o sin columna 'info' no hay nada que cachear
+        if key_col is None or "info" not in first:
+            return process_devicesInfo(rows), {}, len(rows)
+
+        keys = [row.get(key_col) for row in rows]
+        digests = [_info_digest(row.get("info")) for row in rows]
+        derived = [None] * len(rows)
+        pending = []
+
+        for i, (key, digest) in enumerate(zip(keys, digests)):
+            hit = previous.get(key)
+            if hit is not None and hit[0] == digest:
+                derived[i] = hit[1]
+            else:
+                pending.append(i)
+
+        if pending:
+            df_changed = process_devicesInfo([rows[i] for i in pending])
+            records = df_changed.reindex(columns=INFO_DERIVED_COLUMNS).to_dict(orient="records")
+            for i, rec in zip(pending, records):
+                derived[i] = rec
+
+        entries = {key: (digest, rec) for key, digest, rec in zip(keys, digests, derived)}
+
+        df = pd.DataFrame(rows)
+        drop = [c for c in INFO_DERIVED_COLUMNS if c in df.columns]
+        if not keep_info:
+            drop.append("info")
+        df = df.drop(columns=drop)
+        df_derived = pd.DataFrame(derived, columns=INFO_DERIVED_COLUMNS, index=df.index)
+        df = pd.concat([df, df_derived], axis=1)
+
+        return df.astype(object).where(pd.notnull(df), None), entries, len(pending)
+
+    def process(self, json_data):
+        """Procesa la tabla completa; las claves que ya no aparecen salen de la caché."""
+        return self.process_chunks([json_data] if json_data else [])
+
+    def process_chunks(self, chunks, keep_info=True, offset=0, limit=None):
+        """
+        Igual que process() pero consumiendo la tabla por bloques (p.ej. un generador
+        de DatabaseAdapter.iter_device_info). Con keep_info=False el blob 'info'
+        se descarta en cuanto se procesa cada bloque. Con offset/limit solo se
+        conservan las filas de esa ventana: el resto se procesa (para la caché) y
+        se suelta bloque a bloque, así el frame devuelto no crece con la tabla.
+        La caché de derivados sí guarda una entrada por dispositivo.
+        """
+        with self._lock:
+            previous = self._entries
+
+        frames = []
+        entries = {}
+        total = reprocessed = 0
+        end = offset + limit if limit is not None else None
+        for chunk in chunks:
+            rows = list(chunk)
+            if not rows:
+                continue
+            df, chunk_entries, n_pending = self._process_rows(rows, previous, keep_info=keep_info)
+            # Posiciones [total, total + len) del bloque frente a la ventana [offset, end)
+            lo = max(offset - total, 0)
+            hi = len(rows) if end is None else min(end - total, len(rows))
+            if lo < hi:
+                frames.append(df.iloc[lo:hi])
+            entries.update(chunk_entries)
+            total += len(rows)
+            reprocessed += n_pending
+
+        if not total:
+            return pd.DataFrame()
+
+        # Solo se conservan las claves presentes: los dispositivos borrados salen de la caché
+        with self._lock:
+            self._entries = entries
+            self.last_stats = {"total": total, "reprocessed": reprocessed}
+
+        print(f"ℹ️ Device Info: {reprocessed}/{total} filas reprocesadas (resto desde caché).")
+
+        if not frames:
+            return pd.DataFrame(columns=df.columns)
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return df.astype(object).where(pd.notnull(df), None)
+
+    def process_page(self, rows, keep_info=True):
+        """Procesa una página (paginación por clave): usa y completa la caché sin expulsar nada."""
+        rows = list(rows or [])
+        if not rows:
+            return pd.DataFrame()
+        with self._lock:
+            previous = self._entries
+        df, entries, _ = self._process_rows(rows, previous, keep_info=keep_info)
+        with self._lock:
+            self._entries = {**self._entries, **entries}
+        return df
+
+
+# Instancia compartida por los endpoints
+device_info_cache = DeviceInfoCache()
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import json
 import math
 from datetime import datetime, timezone
@@ -84,11 +85,39 @@ def extract_first_connection(json_obj):
         return None
 
 
-def process_installations(raw_data):
+def _epoch_series_to_iso(values):
+    """
+    _epoch_to_iso en bloque: pd.to_datetime(unit="s", utc=True) sobre todo el array.
+    Los valores inválidos quedan como None. Los que caen fuera de datetime64[ns]
+    (~1677-2262, p. ej. caducidades centinela) se convierten uno a uno con
+    _epoch_to_iso, igual que antes de vectorizar.
+    """
+    epochs = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").astype("float64")
+    epochs = epochs.where(np.isfinite(epochs))
+    out_of_range = epochs.abs() >= 9.2e9
+    stamps = pd.to_datetime(epochs.where(~out_of_range), unit="s", utc=True, errors="coerce").dt.floor("s")
+    iso = stamps.dt.strftime('%Y-%m-%dT%H:%M:%SZ').astype(object).where(stamps.notna(), None)
+    if out_of_range.any():
+        iso[out_of_range] = [_epoch_to_iso(v) for v in epochs[out_of_range]]
+    return iso.tolist()
+
+
+def _epoch_series_to_int(values):
+    """Epoch en segundos como int (para que el cliente formatee). None si no es válido."""
+    out = []
+    for v in values:
+        f = _safe_float(v)
+        out.append(int(f) if f is not None else None)
+    return out
+
+
+def process_installations(raw_data, raw_epoch=False):
     """
     Limpia y estructura los datos de Instalaciones.
     'state', 'enabled', 'last_change' y 'first_connection'
-    se extraen del campo 'status'. Los timestamps epoch se convierten a ISO 8601 UTC.
+    se extraen del campo 'status' en una sola pasada.
+    Los timestamps epoch se convierten a ISO 8601 UTC en bloque, o se devuelven
+    como enteros epoch si raw_epoch=True (el cliente los formatea).
     """
     if not raw_data:
         return pd.DataFrame()
@@ -98,12 +127,25 @@ def process_installations(raw_data):
     col_status = df.get('status')
 
     if col_status is not None:
-        status_parsed          = col_status.apply(safe_json)
-        df['state']            = status_parsed.apply(extract_link)
-        df['enabled']          = status_parsed.apply(extract_enabled)
-        df['last_change']      = status_parsed.apply(extract_last_change)
-        df['first_connection'] = status_parsed.apply(extract_first_connection)
-        
+        state, enabled, last_change, first_connection = [], [], [], []
+        for raw in col_status:
+            status = raw if isinstance(raw, dict) else safe_json(raw)
+            if not isinstance(status, dict):
+                status = {}
+            link = status.get("link")
+            if not isinstance(link, dict):
+                link = {}
+            state.append(link.get("detected"))
+            enabled.append(status.get("enabled"))
+            last_change.append(link.get("last_change"))
+            first_connection.append(link.get("first_connection"))
+
+        to_time = _epoch_series_to_int if raw_epoch else _epoch_series_to_iso
+        df['state']            = pd.Series(state, index=df.index, dtype=object)
+        df['enabled']          = pd.Series(enabled, index=df.index, dtype=object)
+        df['last_change']      = pd.Series(to_time(last_change), index=df.index, dtype=object)
+        df['first_connection'] = pd.Series(to_time(first_connection), index=df.index, dtype=object)
+
     else:
         df['state']            = None
         df['enabled']          = None
@@ -125,4 +167,4 @@ def process_installations(raw_data):
     # Garantía final: reemplazar cualquier NaN/Inf residual con None
     df_out = df_out.astype(object).where(pd.notnull(df_out), None)
 
-    return df_out
\ No newline at end of file
+    return df_out
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import json
 
 # ================================
@@ -70,6 +71,80 @@ def determine_usage_tier(mb_value):
     else:
         return "Extremo (> 100 MB)"
 
+# ================================
+# VERSIONES VECTORIZADAS
+# ================================
+
+# Límites de los tiers en MB. El primer límite es el menor float > 0 para que
+# 0 MB (y negativos) caigan en "Inactivo", igual que determine_usage_tier.
+_TIER_BINS = [-np.inf, np.nextafter(0, 1), 1, 10, 100, np.inf]
+_TIER_LABELS = [
+    "Inactivo (0 MB)",
+    "Bajo (< 1 MB)",
+    "Medio (1 - 10 MB)",
+    "Alto (10 - 100 MB)",
+    "Extremo (> 100 MB)",
+]
+
+def usage_tier_series(mb_series):
+    """determine_usage_tier sobre una Serie completa con pd.cut."""
+    tiers = pd.cut(
+        pd.to_numeric(mb_series, errors="coerce"),
+        bins=_TIER_BINS,
+        labels=_TIER_LABELS,
+        right=False,
+    )
+    return tiers.astype(object).where(tiers.notna(), _TIER_LABELS[0])
+
+def readable_bytes_series(bytes_series):
+    """
+    format_bytes_to_readable sobre una Serie completa.
+    Solo se formatean los valores únicos (la mayoría de SIMs repiten consumo, p.ej. 0).
+    """
+    values = pd.to_numeric(bytes_series, errors="coerce").fillna(0).to_numpy(dtype="float64")
+    if values.size == 0:
+        return pd.Series([], index=bytes_series.index, dtype=object)
+
+    uniques, inverse = np.unique(values, return_inverse=True)
+    mb = uniques / 1_048_576.0
+    is_gb = mb >= 1024
+    amount = np.where(is_gb, mb / 1024.0, mb)
+    labels = np.char.add(np.char.mod("%.2f", amount), np.where(is_gb, " GB", " MB"))
+    labels[uniques == 0] = "0 MB"
+    return pd.Series(labels[inverse].astype(object), index=bytes_series.index)
+
+def _parse_nested(series):
+    """Parsea una sola vez cada celda (str JSON o dict ya decodificado)."""
+    return [x if isinstance(x, (dict, list)) else safe_json(x) for x in series]
+
+def _dig(obj, keys):
+    for key in keys:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+def _flatten(parsed, paths):
+    """
+    Aplana en bloque (estilo json_normalize) las rutas pedidas de una lista de dicts.
+    Devuelve un DataFrame con una columna por ruta ('a.b.c').
+    Solo recorre las rutas necesarias: json_normalize aplanaría el objeto entero.
+    """
+    columns = {}
+    for path in paths:
+        keys = path.split(".")
+        columns[path] = [_dig(p, keys) for p in parsed]
+    return pd.DataFrame(columns, columns=paths)
+
+def _total_consumption(parsed):
+    """extract_total_consumption vectorizado: voice + sms + data (bytes, float)."""
+    flat = _flatten(parsed, ["voice.value", "sms.value", "data.value"])
+    values = np.column_stack([
+        pd.to_numeric(flat[col], errors="coerce").fillna(0.0).to_numpy(dtype="float64")
+        for col in flat.columns
+    ]) if len(flat) else np.zeros((0, 3))
+    return pd.Series(values.sum(axis=1), dtype="float64")
+
 # ================================
 # PROCESAMIENTO DE M2M
 # ================================
@@ -121,36 +196,35 @@ def process_m2m(json_data):
     # 5. ICCID (Identificador único SIM)
     df['icc'] = df.get('icc', pd.Series(["N/A"]*len(df))).fillna("N/A").astype(str)
 
-    # 6. PROCESAMIENTO DE CONSUMO (JSON anidado)
+    # 6. PROCESAMIENTO DE CONSUMO (JSON anidado, un solo parseo por celda)
     col_daily = df.get('consumptionDaily', pd.Series([None]*len(df)))
     col_monthly = df.get('consumptionMonthly', pd.Series([None]*len(df)))
-    
-    daily_json = col_daily.apply(safe_json)
-    monthly_json = col_monthly.apply(safe_json)
 
     # Calculamos bytes totales (float)
-    df['cons_daily'] = daily_json.apply(extract_total_consumption)
-    df['cons_month'] = monthly_json.apply(extract_total_consumption)
+    df['cons_daily'] = _total_consumption(_parse_nested(col_daily)).to_numpy()
+    df['cons_month'] = _total_consumption(_parse_nested(col_monthly)).to_numpy()
 
     # Calculamos MB (float) para gráficas
     df['cons_daily_mb'] = df['cons_daily'] / 1_048_576.0
     df['cons_month_mb'] = df['cons_month'] / 1_048_576.0
 
     # Categorización (Tiers)
-    df['usage_tier_daily'] = df['cons_daily_mb'].apply(determine_usage_tier)
-    df['usage_tier_month'] = df['cons_month_mb'].apply(determine_usage_tier)
+    df['usage_tier_daily'] = usage_tier_series(df['cons_daily_mb'])
+    df['usage_tier_month'] = usage_tier_series(df['cons_month_mb'])
 
     # Formato legible para Tabla (Strings)
-    df['cons_daily_readable'] = df['cons_daily'].apply(format_bytes_to_readable)
-    df['cons_month_readable'] = df['cons_month'].apply(format_bytes_to_readable)
+    df['cons_daily_readable'] = readable_bytes_series(df['cons_daily'])
+    df['cons_month_readable'] = readable_bytes_series(df['cons_month'])
 
     # 7. PAÍS (Desde 'presence')
     col_presence = df.get('presence', pd.Series([None]*len(df)))
-    df['country_code'] = col_presence.apply(safe_json).apply(extract_countryCode)
+    country = _flatten(_parse_nested(col_presence), ["sgsn.operator.countryCode"])["sgsn.operator.countryCode"]
+    country = country.where(country.notna() & (country.astype(str) != ""), "N/A")
+    df['country_code'] = country.astype(object).to_numpy()
 
     # 8. ALARMAS
     col_alarms = df.get('alarms', pd.Series([None]*len(df)))
-    df['alarm_count'] = col_alarms.apply(safe_json).apply(extract_alarm_count)
+    df['alarm_count'] = [len(a) if isinstance(a, list) else 0 for a in _parse_nested(col_alarms)]
 
     #9. commercialGroupId (ID de grupo comercial)
     col_com = df.get('commercialGroupId', pd.Series([None]*len(df)))
@@ -1,6 +1,8 @@
 # Archivo: app/logic/data_pool.py
 import pandas as pd
+import numpy as np
 import ast
+import json
 
 def extract_sim(val):
     """
@@ -47,39 +49,74 @@ def extract_consumo(val):
     except:
         return pd.Series([0, 0], index=['bytes_consumed', 'bytes_limit'])
 
+def _parse_cell(val):
+    """
+    Convierte la celda a dict. Primero JSON (rápido); si falla (None, True...),
+    literal Python como hacía ast.literal_eval.
+    """
+    if isinstance(val, dict):
+        return val
+    if isinstance(val, str):
+        try:
+            # Los dicts llegan serializados con comillas simples: se prueba como JSON antes de literal_eval
+            parsed = json.loads(val.replace("'", '"'))
+        except ValueError:
+            try:
+                parsed = ast.literal_eval(val)
+            except (ValueError, SyntaxError):
+                return {}
+        return parsed if isinstance(parsed, dict) else {}
+    return {}
+
+def _to_int(val):
+    if val is None or val is False:
+        return 0
+    try:
+        f = float(val)
+    except (TypeError, ValueError):
+        return 0
+    return int(f) if np.isfinite(f) else 0
+
+def extract_pairs(series, key_a, key_b):
+    """
+    Parsea la columna en una sola pasada y devuelve dos arrays int64
+    con los valores de key_a y key_b (0 si faltan o no son válidos).
+    """
+    parsed = [_parse_cell(v) for v in series]
+    a = np.fromiter((_to_int(d.get(key_a)) for d in parsed), dtype="int64", count=len(parsed))
+    b = np.fromiter((_to_int(d.get(key_b)) for d in parsed), dtype="int64", count=len(parsed))
+    return a, b
+
+def usage_percent_array(consumed, limit):
+    """consumed / limit * 100 (0.0 donde no hay límite), redondeado a 2 decimales."""
+    consumed = np.asarray(consumed, dtype="float64")
+    limit = np.asarray(limit, dtype="float64")
+    pct = np.divide(consumed, limit, out=np.zeros_like(consumed), where=limit > 0) * 100
+    return np.round(pct, 2)
+
 def process_pools(raw_data):
     """
-    Limpia y estructura los datos de Pools usando las funciones de extracción.
+    Limpia y estructura los datos de Pools.
+    activeSim/consumedData se parsean en bloque a arrays NumPy (sin pd.Series por fila).
     """
     if not raw_data:
         return pd.DataFrame()
 
     df = pd.DataFrame(raw_data)
+    df_clean = df.copy()
+    empty = pd.Series([None] * len(df), index=df.index)
 
     # 1. Procesar columnas complejas generando nuevas columnas
-    # Esto devuelve un DataFrame con 'sims_active' y 'sims_total'
-    sim_cols = df['activeSim'].apply(extract_sim)
-    
-    # Esto devuelve un DataFrame con 'bytes_consumed' y 'bytes_limit'
-    usage_cols = df['consumedData'].apply(extract_consumo)
-
-    # 2. Unir todo al DataFrame original
-    df_clean = pd.concat([df, sim_cols, usage_cols], axis=1)
-
-    # 3. Limpieza y Conversión de Tipos
-    cols_to_fix = ['sims_active', 'sims_total', 'bytes_consumed', 'bytes_limit']
-    for col in cols_to_fix:
-        if col in df_clean.columns:
-            # fillna(0) y asegurar int (especialmente para bytes grandes)
-            df_clean[col] = df_clean[col].fillna(0).astype('int64')
-        else:
-            df_clean[col] = 0
-
-    # 4. Cálculos útiles para el Dashboard
-    df_clean['usage_percent'] = df_clean.apply(
-        lambda row: (row['bytes_consumed'] / row['bytes_limit'] * 100) if row['bytes_limit'] > 0 else 0.0, 
-        axis=1
-    )
+    sims_active, sims_total = extract_pairs(df.get('activeSim', empty), "activeCards", "totalSim")
+    bytes_consumed, bytes_limit = extract_pairs(df.get('consumedData', empty), "consumedData", "limitData")
+
+    df_clean['sims_active'] = sims_active
+    df_clean['sims_total'] = sims_total
+    df_clean['bytes_consumed'] = bytes_consumed
+    df_clean['bytes_limit'] = bytes_limit
+
+    # 2. Cálculos útiles para el Dashboard (división vectorizada con máscara)
+    df_clean['usage_percent'] = usage_percent_array(bytes_consumed, bytes_limit)
 
     mask_KI = df["commercialGroup"].str.contains("KICONEX", case=False, na=False)
     df_clean.loc[mask_KI, 'organization'] = 'KICONEX'
@@ -93,11 +130,9 @@ def process_pools(raw_data):
     mask_IN = df["commercialGroup"].str.contains("INTARCON", case=False, na=False)
     df_clean.loc[mask_IN, 'organization'] = 'INTARCON'
 
-    # Redondear porcentaje a 2 decimales
-    df_clean['usage_percent'] = df_clean['usage_percent'].round(2)
     df_clean['organization'] = df_clean['organization'].fillna('Sin Organización')
 
-    # 5. Seleccionar columnas finales
+    # 3. Seleccionar columnas finales
     final_cols = [
         'pool_id',
         'organization', 
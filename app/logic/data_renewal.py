@@ -14,28 +14,40 @@ def _clean_str(series: pd.Series) -> pd.Series:
         return series
     return series.astype(str).str.strip()
 
+DATE_FORMAT = "%Y-%m-%d"
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    """Parsea a datetime64 con formato explícito (sin inferencia por elemento)."""
+    text = series.astype(str).str.slice(0, 10)
+    return pd.to_datetime(text, format=DATE_FORMAT, errors="coerce", cache=True)
+
 def _to_date_yyyy_mm_dd(df: pd.DataFrame, col: str):
     if col in df.columns:
-        df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d")
-        df[col] = df[col].replace("NaT", None).replace("nan", None)
+        dates = _parse_dates(df[col])
+        df[col] = dates.dt.strftime(DATE_FORMAT).astype(object).where(dates.notna(), None)
 
 def _clean_and_return(df: pd.DataFrame):
     df = df.astype(object)
     df = df.where(pd.notnull(df), None)
     return df.to_dict(orient="records")
 
+_STATUS_LABELS = {
+    "active":         "Activa",
+    "inactive":       "Inactiva",
+    "cancelled":      "Cancelada",
+    "expired":        "Expirada",
+    "not-applicable": "No Aplicable",
+    "unknown":        "Desconocido",
+    "desconocido":    "Desconocido",
+}
+
 def _status_label(val) -> str:
     s = str(val).lower().strip() if val is not None else ""
-    mapping = {
-        "active":         "Activa",
-        "inactive":       "Inactiva",
-        "cancelled":      "Cancelada",
-        "expired":        "Expirada",
-        "not-applicable": "No Aplicable",
-        "unknown":        "Desconocido",
-        "desconocido":    "Desconocido",
-    }
-    return mapping.get(s, "Desconocido")
+    return _STATUS_LABELS.get(s, "Desconocido")
+
+def _status_label_series(series: pd.Series) -> pd.Series:
+    """_status_label vectorizado con map."""
+    return series.astype(str).str.lower().str.strip().map(_STATUS_LABELS).fillna("Desconocido")
 
 # ----------------------------
 # Enriquecimiento común: uuid -> devices -> software -> models
@@ -147,7 +159,7 @@ def _apply_common_fields(df: pd.DataFrame) -> pd.DataFrame:
     if "state" not in df.columns:
         df["state"] = "Desconocido"
     df["state"] = df["state"].fillna("Desconocido").replace("", "Desconocido")
-    df["state_label"] = df["state"].apply(_status_label)
+    df["state_label"] = _status_label_series(df["state"])
 
     if "ki_subscription_state" not in df.columns:
         df["ki_subscription_state"] = "Desconocido"
@@ -156,7 +168,7 @@ def _apply_common_fields(df: pd.DataFrame) -> pd.DataFrame:
     # Excluir "not-applicable" en origen — no llegan al frontend ni a ninguna lógica del dashboard
     df = df[df["ki_subscription_state"].str.lower().str.strip() != "not-applicable"].reset_index(drop=True)
 
-    df["ki_subscription_state_label"] = df["ki_subscription_state"].apply(_status_label)
+    df["ki_subscription_state_label"] = _status_label_series(df["ki_subscription_state"])
 
     return df
 
@@ -231,4 +243,62 @@ def process_plan_renewals_logic(raw_plan_ren, raw_devices, raw_models, raw_softw
     df = _apply_common_fields(df)
     df = _enrich_devices_models(df, raw_devices, raw_models, raw_software)
 
-    return _clean_and_return(df)
\ No newline at end of file
+    return _clean_and_return(df)
+
+
+# ----------------------------
+# Índice por date_to_renew (snapshot)
+# ----------------------------
+def date_bound(value) -> np.datetime64:
+    """
+    Límite de rango como datetime64[ns], comparable con el índice. Las fechas
+    fuera de lo representable en ns (antes de 1677 o después de 2262) se
+    recortan a pd.Timestamp.min / max en lugar de desbordar.
+    Lanza ValueError si el valor no es una fecha.
+    """
+    try:
+        ts = pd.Timestamp(value)
+    except pd.errors.OutOfBoundsDatetime:
+        # pandas sin unidades no-ns: decidir el extremo con numpy, que sí representa esas fechas
+        late = np.datetime64(str(value)) > np.datetime64("1970-01-01")
+        ts = pd.Timestamp.max if late else pd.Timestamp.min
+    if ts is pd.NaT:
+        raise ValueError(f"Fecha no válida: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    ts = min(max(ts, pd.Timestamp.min), pd.Timestamp.max)
+    return np.datetime64(ts.to_datetime64(), "ns")
+
+class RenewalIndex:
+    """
+    Índice ordenado por date_to_renew sobre las renovaciones ya procesadas.
+    Las consultas por rango ("qué renueva en los próximos N días") se
+    resuelven con búsqueda binaria en lugar de recorrer todo el listado.
+    Los registros sin date_to_renew no entran en el índice.
+    """
+
+    def __init__(self, records, date_col="date_to_renew"):
+        self.records = records
+        dates = _parse_dates(pd.Series([r.get(date_col) for r in records], dtype=object))
+        values = dates.to_numpy(dtype="datetime64[ns]")
+        valid = np.flatnonzero(dates.notna().to_numpy())
+        self._order = valid[np.argsort(values[valid], kind="stable")]
+        self._dates = values[self._order]
+
+    def __len__(self):
+        return len(self._order)
+
+    def between(self, start=None, end=None):
+        """Registros con start <= date_to_renew <= end (fechas YYYY-MM-DD, ambos opcionales)."""
+        lo = 0
+        hi = len(self._dates)
+        if start:
+            lo = np.searchsorted(self._dates, date_bound(start), side="left")
+        if end:
+            hi = np.searchsorted(self._dates, date_bound(end), side="right")
+        return [self.records[i] for i in self._order[lo:hi]]
+
+    def due_within(self, days, today=None):
+        """Registros que renuevan entre hoy y hoy + days (inclusive)."""
+        today = pd.Timestamp(today).normalize() if today else pd.Timestamp.now().normalize()
+        return self.between(today, today + pd.Timedelta(days=days))
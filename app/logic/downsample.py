@@ -0,0 +1,133 @@
+# Archivo: app/logic/downsample.py
+import numpy as np
+import pandas as pd
+
+# Claves candidatas para el eje X en series de históricos
+_X_KEYS = ("timestamp", "date", "day", "month", "period", "bucket_start", "fecha")
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: índices de los puntos a conservar (incluye
+    siempre el primero y el último). El cálculo dentro de cada bucket es vectorizado;
+    solo se itera sobre los buckets (max_points), no sobre los puntos.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # Límites de los max_points - 2 buckets interiores
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    y = np.nan_to_num(y)
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+
+    for b in range(max_points - 2):
+        start, end = edges[b], max(edges[b + 1], edges[b] + 1)
+        # Punto medio del bucket siguiente (o el último punto)
+        if b + 2 < len(edges):
+            nxt_start, nxt_end = edges[b + 1], max(edges[b + 2], edges[b + 1] + 1)
+            avg_x = x[nxt_start:nxt_end].mean()
+            avg_y = y[nxt_start:nxt_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        px, py = x[prev], y[prev]
+        area = np.abs(
+            (px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py)
+        )
+        prev = start + int(np.argmax(area))
+        selected[b + 1] = prev
+
+    return selected
+
+
+def _x_values(values):
+    """Eje X numérico: fechas → epoch (s); si no son fechas, la posición."""
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", utc=True)
+    if parsed.notna().all() and len(parsed):
+        epoch = pd.Timestamp("1970-01-01", tz="UTC")
+        return ((parsed - epoch) / pd.Timedelta(seconds=1)).to_numpy(dtype="float64")
+    return np.arange(len(values), dtype="float64")
+
+
+def _combined_y(columns):
+    """
+    Varias series → una sola para elegir índices comunes: suma de las series
+    normalizadas a su rango, así todas influyen en la forma.
+    """
+    total = None
+    for col in columns:
+        arr = np.nan_to_num(np.asarray(col, dtype="float64"))
+        span = arr.max() - arr.min() if len(arr) else 0
+        arr = (arr - arr.min()) / span if span else np.zeros_like(arr)
+        total = arr if total is None else total + arr
+    return total
+
+
+def downsample_records(records, max_points, x_key=None, y_keys=None):
+    """LTTB sobre una lista de dicts (p.ej. filas de alarm_counts). Devuelve la lista reducida."""
+    if not records or not max_points or len(records) <= max_points:
+        return records
+
+    first = records[0]
+    if not isinstance(first, dict):
+        return records
+    x_key = x_key or next((k for k in _X_KEYS if k in first), None)
+    if y_keys is None:
+        y_keys = [
+            k for k, v in first.items()
+            if k != x_key and k != "id" and isinstance(v, (int, float)) and not isinstance(v, bool)
+        ]
+    if not y_keys:
+        return records
+
+    x = _x_values([r.get(x_key) for r in records]) if x_key else np.arange(len(records), dtype="float64")
+    y = _combined_y([[r.get(k) if isinstance(r.get(k), (int, float)) else np.nan for r in records] for k in y_keys])
+    return [records[i] for i in lttb_indices(x, y, max_points)]
+
+
+def downsample_chart(payload, max_points):
+    """
+    Reduce un histórico con la forma que devuelva el upstream:
+    - lista de registros
+    - {"labels": [...], "datasets": [{"data": [...]}, ...]} (formato gráfico)
+    - dict con la lista dentro (content / data / primera lista)
+    Si no se reconoce la forma, se devuelve sin tocar.
+    """
+    if not max_points:
+        return payload
+
+    if isinstance(payload, list):
+        return downsample_records(payload, max_points)
+
+    if not isinstance(payload, dict):
+        return payload
+
+    labels = payload.get("labels")
+    datasets = payload.get("datasets")
+    if isinstance(labels, list) and isinstance(datasets, list) and len(labels) > max_points:
+        series = [d.get("data") for d in datasets if isinstance(d, dict) and isinstance(d.get("data"), list)]
+        if not series or any(len(s) != len(labels) for s in series):
+            return payload
+        idx = lttb_indices(_x_values(labels), _combined_y(series), max_points)
+        out = dict(payload)
+        out["labels"] = [labels[i] for i in idx]
+        out["datasets"] = [
+            {**d, "data": [d["data"][i] for i in idx]} if isinstance(d, dict) and isinstance(d.get("data"), list) else d
+            for d in datasets
+        ]
+        return out
+
+    for key in ("content", "data"):
+        if isinstance(payload.get(key), list):
+            return {**payload, key: downsample_records(payload[key], max_points)}
+    for key, value in payload.items():
+        if isinstance(value, list):
+            return {**payload, key: downsample_records(value, max_points)}
+    return payload
@@ -0,0 +1,179 @@
+# Archivo: app/logic/m2m_batch.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Campos candidatos en históricos con forma de lista de registros
+_LABEL_KEYS = ("date", "day", "month", "period", "label", "timestamp")
+_VALUE_KEYS = ("consumption", "bytes", "value", "total", "data", "mb")
+
+PERCENTILES = (50, 90, 95)
+
+
+# ----------------------------
+# Selección de SIMs
+# ----------------------------
+def select_iccs(df_m2m, organization=None, iccs=None, filters=None):
+    """
+    ICCs del lote: lista explícita, o filtro sobre el frame de process_m2m
+    (organización y/o {columna: valor | [valores]}). Sin duplicados, en orden.
+    """
+    selected = [str(i).strip() for i in (iccs or []) if str(i).strip()]
+
+    if organization or filters:
+        if df_m2m is None or df_m2m.empty:
+            return selected
+        mask = pd.Series(True, index=df_m2m.index)
+        if organization:
+            mask &= df_m2m["organization"].astype(str).str.strip().str.upper() == organization.strip().upper()
+        for col, value in (filters or {}).items():
+            if col not in df_m2m.columns:
+                raise ValueError(f"Columna de filtro desconocida: {col}")
+            values = value if isinstance(value, list) else [value]
+            mask &= df_m2m[col].isin(values)
+        from_frame = df_m2m.loc[mask, "icc"].astype(str).str.strip()
+        if selected:
+            wanted = set(from_frame)
+            selected = [i for i in selected if i in wanted]
+        else:
+            selected = from_frame[from_frame != "N/A"].tolist()
+
+    return list(dict.fromkeys(selected))
+
+
+# ----------------------------
+# Extracción de puntos (periodo, valor)
+# ----------------------------
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def history_points(payload):
+    """
+    Lista de (periodo, valor) de un histórico con la forma del upstream:
+    formato gráfico (labels + suma de datasets) o lista de registros.
+    """
+    if isinstance(payload, dict):
+        labels = payload.get("labels")
+        datasets = payload.get("datasets")
+        if isinstance(labels, list) and isinstance(datasets, list):
+            series = [d.get("data") for d in datasets if isinstance(d, dict) and isinstance(d.get("data"), list)]
+            series = [s for s in series if len(s) == len(labels)]
+            if not series:
+                return []
+            block = np.array([[_to_float(v) for v in s] for s in series])
+            # Periodo sin ningún valor: NaN (no 0) para que no cuente en los agregados
+            values = np.where(np.isnan(block).all(axis=0), np.nan, np.nansum(block, axis=0))
+            return [(str(label), float(v)) for label, v in zip(labels, values)]
+        for key in ("content", "data"):
+            if isinstance(payload.get(key), list):
+                return history_points(payload[key])
+        return []
+
+    if not isinstance(payload, list) or not payload or not isinstance(payload[0], dict):
+        return []
+
+    first = payload[0]
+    label_key = next((k for k in _LABEL_KEYS if k in first), None)
+    value_key = next((k for k in _VALUE_KEYS if k in first), None)
+    if value_key is None:
+        value_key = next((k for k, v in first.items() if k != label_key and isinstance(v, (int, float))), None)
+    if label_key is None or value_key is None:
+        return []
+    return [(str(row.get(label_key)), _to_float(row.get(value_key))) for row in payload]
+
+
+# ----------------------------
+# Agregados por periodo (NumPy)
+# ----------------------------
+def aggregate_periods(points_by_icc):
+    """
+    Totales y percentiles por periodo sobre todas las SIMs del lote.
+    points_by_icc: {icc: [(periodo, valor), ...]}
+    """
+    periods = sorted({p for points in points_by_icc.values() for p, _ in points})
+    if not periods:
+        return []
+    col = {p: i for i, p in enumerate(periods)}
+
+    matrix = np.full((len(points_by_icc), len(periods)), np.nan)
+    for row, points in enumerate(points_by_icc.values()):
+        for period, value in points:
+            matrix[row, col[period]] = value
+
+    counts = (~np.isnan(matrix)).sum(axis=0)
+    has_data = counts > 0
+    totals = np.full(len(periods), np.nan)
+    means = np.full(len(periods), np.nan)
+    pcts = np.full((len(PERCENTILES), len(periods)), np.nan)
+    # Solo columnas con algún valor: así nanmean/nanpercentile no avisan por columnas vacías
+    if has_data.any():
+        block = matrix[:, has_data]
+        totals[has_data] = np.nansum(block, axis=0)
+        means[has_data] = np.nanmean(block, axis=0)
+        pcts[:, has_data] = np.nanpercentile(block, PERCENTILES, axis=0)
+
+    def _clean(v):
+        return None if np.isnan(v) else float(v)
+
+    return [
+        {
+            "period": period,
+            "sims": int(counts[j]),
+            "total": _clean(totals[j]),
+            "mean": _clean(means[j]),
+            **{f"p{q}": _clean(pcts[k, j]) for k, q in enumerate(PERCENTILES)},
+        }
+        for j, period in enumerate(periods)
+    ]
+
+
+# ----------------------------
+# Reparto con concurrencia y ritmo limitados
+# ----------------------------
+class RateLimiter:
+    """
+    Como mucho `rate` llamadas por segundo, repartidas entre hilos. Se llama a
+    wait() justo antes de cada petición real al upstream (ver M2MHistoryCache).
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def iter_batch_history(fetch, iccs, concurrency=4):
+    """
+    Lanza fetch(icc) para cada ICC con un máximo de `concurrency` en vuelo y
+    genera (icc, payload, error) según van terminando. El ritmo de peticiones
+    lo marca fetch (RateLimiter en las llamadas reales, no por SIM).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(fetch, icc): icc for icc in iccs}
+        try:
+            for future in as_completed(futures):
+                icc = futures[future]
+                try:
+                    yield icc, future.result(), None
+                except Exception as e:
+                    yield icc, None, str(e)
+        finally:
+            # Cliente desconectado: no lanzar las que aún no han empezado
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,153 @@
+# Archivo: app/logic/search_index.py
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+# Campos indexados, por orden de prioridad en el ranking
+SEARCH_FIELDS = ("uuid", "icc", "name", "final_client", "organization", "m2m_name")
+
+_TOKEN_SPLIT = re.compile(r"[\s_\-/.,:;|()]+")
+_SEP = 10        # b"\n": separador entre valores en el bloque de bytes
+_VID_BITS = 24   # clave de trigrama = (código de 3 bytes << 24) | id de valor
+
+
+def normalize_text(val):
+    """Minúsculas, sin acentos y sin espacios sobrantes."""
+    if val is None:
+        return ""
+    s = " ".join(str(val).split()).lower()
+    if s.isascii():
+        return s
+    s = unicodedata.normalize("NFKD", s)
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+class SearchIndex:
+    """
+    Índice en memoria para typeahead sobre nombre, uuid, ICC y clientes.
+    Se resuelve por niveles, de más a menos relevante, y se corta al llegar a 'limit':
+      3. coincidencia exacta del campo completo       (dict)
+      2. prefijo del campo o de una de sus palabras   (términos ordenados + bisect)
+      1. subcadena en cualquier campo                  (índice de trigramas en NumPy)
+    Los valores se indexan una sola vez aunque se repitan (organizaciones, clientes).
+    """
+
+    def __init__(self, records, fields=SEARCH_FIELDS):
+        self.records = records
+        self.fields = fields
+
+        value_ids = {}                 # valor normalizado -> id de valor
+        self._value_refs = []          # id de valor -> [(id registro, campo)]
+        cache = {}
+
+        for i, rec in enumerate(records):
+            for field in fields:
+                raw = rec.get(field)
+                if raw is None:
+                    continue
+                value = cache.get(raw)
+                if value is None:
+                    value = cache[raw] = normalize_text(raw)
+                if not value or value in ("none", "nan", "n/a"):
+                    continue
+                vid = value_ids.get(value)
+                if vid is None:
+                    vid = value_ids[value] = len(self._value_refs)
+                    self._value_refs.append([])
+                self._value_refs[vid].append((i, field))
+
+        self._exact = value_ids
+        values = list(value_ids)
+
+        # Términos para prefijo: el valor completo y cada una de sus palabras
+        terms = []
+        for vid, value in enumerate(values):
+            terms.append((value, vid))
+            for token in _TOKEN_SPLIT.split(value):
+                if token and token != value:
+                    terms.append((token, vid))
+        terms.sort()
+        self._terms = [t[0] for t in terms]
+        self._term_vids = [t[1] for t in terms]
+
+        # Subcadena: trigramas de bytes (UTF-8) de todos los valores distintos, en bloque
+        self._values = values
+        encoded = [v.encode("utf-8") for v in values]
+        blob = np.frombuffer(b"\n".join(encoded), dtype=np.uint8).astype(np.int64)
+        lengths = np.fromiter((len(e) + 1 for e in encoded), dtype=np.int64, count=len(encoded))
+        vid_at = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)[:len(blob)]
+
+        if len(blob) >= 3:
+            codes = (blob[:-2] << 16) | (blob[1:-1] << 8) | blob[2:]
+            valid = (blob[:-2] != _SEP) & (blob[1:-1] != _SEP) & (blob[2:] != _SEP)
+            keys = np.sort((codes[valid] << _VID_BITS) | vid_at[:-2][valid])
+            self._tri_keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        else:
+            self._tri_keys = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _postings(self, code):
+        lo = np.searchsorted(self._tri_keys, code << _VID_BITS, side="left")
+        hi = np.searchsorted(self._tri_keys, (code + 1) << _VID_BITS, side="left")
+        return self._tri_keys[lo:hi] & ((1 << _VID_BITS) - 1)
+
+    def _substring_candidates(self, q):
+        """Ids de valor que contienen todos los trigramas de q (ordenados)."""
+        qb = q.encode("utf-8")
+        if len(qb) < 3:
+            return np.zeros(0, dtype=np.int64)
+        codes = {(qb[i] << 16) | (qb[i + 1] << 8) | qb[i + 2] for i in range(len(qb) - 2)}
+        postings = sorted((self._postings(c) for c in codes), key=len)
+        candidates = postings[0]
+        for p in postings[1:]:
+            # Con pocos candidatos sale más barato verificar con 'in' que seguir intersecando
+            if len(candidates) <= 64:
+                break
+            # Intersección por búsqueda binaria: O(candidatos · log |p|)
+            pos = np.minimum(np.searchsorted(p, candidates), len(p) - 1)
+            candidates = candidates[p[pos] == candidates]
+        return candidates
+
+    def search(self, query, limit=20):
+        q = normalize_text(query)
+        if not q:
+            return []
+
+        hits = {}  # id registro -> (score, campo); dict mantiene el orden de inserción
+
+        def add_value(vid, score):
+            for i, field in self._value_refs[vid]:
+                if i not in hits:
+                    hits[i] = (score, field)
+                    if len(hits) >= limit:
+                        return True
+            return False
+
+        # 3. Exacto
+        vid = self._exact.get(q)
+        if vid is not None and add_value(vid, 3):
+            return self._format(hits)
+
+        # 2. Prefijo (términos ordenados: los más cortos/alfabéticos primero)
+        pos = bisect_left(self._terms, q)
+        while pos < len(self._terms) and self._terms[pos].startswith(q):
+            if add_value(self._term_vids[pos], 2):
+                return self._format(hits)
+            pos += 1
+
+        # 1. Subcadena (candidatos por trigramas, verificación con 'in')
+        for vid in self._substring_candidates(q):
+            if q in self._values[vid] and add_value(int(vid), 1):
+                return self._format(hits)
+
+        return self._format(hits)
+
+    def _format(self, hits):
+        return [
+            {"score": score, "matched_field": field, **self.records[i]}
+            for i, (score, field) in hits.items()
+        ]
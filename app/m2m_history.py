@@ -0,0 +1,316 @@
+# Archivo: app/m2m_history.py
+import itertools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from app.config.settings import Settings
+from app.snapshots import SnapshotCache
+
+
+# ----------------------------
+# Segmentación por mes natural
+# ----------------------------
+def _month_end(day):
+    first_next = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return first_next - timedelta(days=1)
+
+def month_segments(start, end):
+    """Parte [start, end] (date) en tramos que no cruzan de mes."""
+    segments = []
+    cursor = start
+    while cursor <= end:
+        seg_end = min(_month_end(cursor), end)
+        segments.append((cursor, seg_end))
+        cursor = seg_end + timedelta(days=1)
+    return segments
+
+def parse_range(start_date, end_date):
+    """(start, end) como date a partir de YYYY-MM-DD; ValueError si no son válidas o end < start."""
+    try:
+        start = date.fromisoformat(str(start_date)[:10])
+        end = date.fromisoformat(str(end_date)[:10])
+    except ValueError:
+        raise ValueError(f"Fechas no válidas (YYYY-MM-DD): {start_date} / {end_date}")
+    if end < start:
+        raise ValueError("end_date debe ser posterior a start_date")
+    return start, end
+
+def is_closed(seg_end, monthly, today, grace_days=1):
+    """
+    Un tramo está cerrado (su consumo ya no cambia) si terminó hace más de
+    `grace_days` días: el upstream puede anotar consumos con retraso, así que
+    ayer todavía no se congela. En modo mensual además debe ser de un mes anterior.
+    """
+    settled = seg_end + timedelta(days=grace_days) < today
+    if monthly:
+        return settled and seg_end < today.replace(day=1)
+    return settled
+
+
+# ----------------------------
+# Unión de respuestas
+# ----------------------------
+def stitch(parts):
+    """
+    Concatena las respuestas de varios tramos consecutivos con la forma del upstream:
+    - lista de registros
+    - {"labels": [...], "datasets": [{"data": [...]}, ...]} (formato gráfico)
+    - dict con la lista dentro (content / data / primera lista)
+    Devuelve None si las formas no son compatibles.
+    """
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return []
+    if len(parts) == 1:
+        return parts[0]
+
+    if all(isinstance(p, list) for p in parts):
+        return [row for p in parts for row in p]
+
+    if not all(isinstance(p, dict) for p in parts):
+        return None
+
+    if all(isinstance(p.get("labels"), list) and isinstance(p.get("datasets"), list) for p in parts):
+        n_sets = len(parts[0]["datasets"])
+        if any(len(p["datasets"]) != n_sets for p in parts):
+            return None
+        out = dict(parts[-1])
+        out["labels"] = [label for p in parts for label in p["labels"]]
+        datasets = []
+        for i in range(n_sets):
+            base = parts[-1]["datasets"][i]
+            if not isinstance(base, dict):
+                return None
+            data = []
+            for p in parts:
+                values = p["datasets"][i].get("data") if isinstance(p["datasets"][i], dict) else None
+                if not isinstance(values, list):
+                    return None
+                data.extend(values)
+            datasets.append({**base, "data": data})
+        out["datasets"] = datasets
+        return out
+
+    for key in ("content", "data"):
+        if all(isinstance(p.get(key), list) for p in parts):
+            return {**parts[-1], key: [row for p in parts for row in p[key]]}
+    return None
+
+
+# Claves de fecha en los históricos en formato lista de registros
+_DATE_KEYS = ("date", "day", "month", "period", "timestamp", "label")
+
+def _label_month(label):
+    """(año, mes) de una etiqueta de periodo (YYYY-MM[-DD...] o epoch en s/ms); None si no es fecha."""
+    if isinstance(label, bool):
+        return None
+    if isinstance(label, (int, float)):
+        seconds = label / 1000 if label > 1e11 else label
+        try:
+            day = date.fromtimestamp(seconds)
+        except (OverflowError, OSError, ValueError):
+            return None
+        return day.year, day.month
+    match = re.match(r"^(\d{4})-(\d{2})", str(label))
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+def _months_of(rows, labels=None):
+    """Mes de cada elemento (por sus etiquetas o por su clave de fecha); None si alguno no tiene."""
+    if labels is None:
+        if not all(isinstance(r, dict) for r in rows):
+            return None
+        key = next((k for k in _DATE_KEYS if rows and k in rows[0]), None)
+        if rows and key is None:
+            return None
+        labels = [r.get(key) for r in rows]
+    months = [_label_month(label) for label in labels]
+    return None if any(m is None for m in months) else months
+
+def split(data, segments):
+    """
+    Inverso de stitch: reparte la respuesta de un rango entre sus tramos mensuales
+    (segments, de month_segments), por la fecha de cada registro o etiqueta.
+    Devuelve una respuesta por tramo con la misma forma, o None si la forma no se
+    reconoce o algún elemento no tiene fecha (no se puede cachear por tramos).
+    """
+    index = {(s.year, s.month): i for i, (s, _) in enumerate(segments)}
+
+    def pick(months, values):
+        out = [[] for _ in segments]
+        for month, value in zip(months, values):
+            if month not in index:
+                return None
+            out[index[month]].append(value)
+        return out
+
+    if isinstance(data, list):
+        months = _months_of(data)
+        return None if months is None else pick(months, data)
+
+    if not isinstance(data, dict):
+        return None
+
+    labels, datasets = data.get("labels"), data.get("datasets")
+    if isinstance(labels, list) and isinstance(datasets, list):
+        months = _months_of(None, labels)
+        if months is None or not all(
+            isinstance(d, dict) and isinstance(d.get("data"), list) and len(d["data"]) == len(labels) for d in datasets
+        ):
+            return None
+        label_parts = pick(months, labels)
+        if label_parts is None:
+            return None
+        data_parts = [pick(months, d["data"]) for d in datasets]
+        return [
+            {**data, "labels": label_parts[i], "datasets": [{**d, "data": part[i]} for d, part in zip(datasets, data_parts)]}
+            for i in range(len(segments))
+        ]
+
+    for key in ("content", "data"):
+        if isinstance(data.get(key), list):
+            months = _months_of(data[key])
+            parts = None if months is None else pick(months, data[key])
+            return None if parts is None else [{**data, key: part} for part in parts]
+    return None
+
+
+# ----------------------------
+# Caché
+# ----------------------------
+class M2MHistoryCache:
+    """
+    Caché del histórico de consumo M2M por ICC y tramo mensual.
+    Los tramos cerrados (días/meses ya pasados) no cambian: se guardan en disco
+    para siempre y sobreviven a reinicios. Solo el tramo abierto (mes en curso)
+    se pide de nuevo al upstream, con un TTL corto. Un rango se sirve uniendo
+    los tramos cacheados con el tramo vivo.
+    """
+
+    def __init__(self, client, cache_dir=None, ttl=None):
+        self.client = client
+        self.cache_dir = cache_dir or Settings.M2M_HISTORY_CACHE_DIR
+        self.live = SnapshotCache(ttl=Settings.M2M_HISTORY_TTL if ttl is None else ttl)
+        # LRU acotado de tramos cerrados ya leídos; el resto se relee de disco
+        self._memory = OrderedDict()
+        self.max_memory = Settings.M2M_HISTORY_MEMORY_SEGMENTS
+        # (icc, monthly) cuya respuesta no se puede repartir por meses: siempre rango completo
+        self._unsegmented = set()
+        self._lock = threading.Lock()
+
+    def _path(self, icc, monthly, start, end):
+        safe_icc = re.sub(r"[^0-9A-Za-z_-]", "_", icc)
+        mode = "m" if monthly else "d"
+        return os.path.join(self.cache_dir, safe_icc, f"{mode}_{start.isoformat()}_{end.isoformat()}.json")
+
+    def _fetch(self, icc, start, end, monthly, limiter=None):
+        if limiter is not None:
+            # Solo las llamadas reales al upstream consumen turno del limitador
+            limiter.wait()
+        payload = {"start_date": start.isoformat(), "end_date": end.isoformat(), "monthly": monthly}
+        return self.client.get_m2m_history(icc, payload)
+
+    def _remember(self, path, data):
+        with self._lock:
+            self._memory[path] = data
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def _load_closed(self, path):
+        with self._lock:
+            if path in self._memory:
+                self._memory.move_to_end(path)
+                return self._memory[path]
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        self._remember(path, data)
+        return data
+
+    def _store_closed(self, path, data):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escritura atómica: un fichero a medias nunca queda como caché válida
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el histórico en caché ({path}): {e}")
+        self._remember(path, data)
+
+    def _live(self, icc, start, end, monthly, limiter=None):
+        key = f"m2m_history:{icc}:{int(monthly)}:{start.isoformat()}:{end.isoformat()}"
+        return self.live.get(key, lambda: self._fetch(icc, start, end, monthly, limiter))
+
+    def _fetch_closed(self, icc, run, monthly, limiter=None):
+        """
+        Tramos cerrados consecutivos sin caché: una sola llamada al upstream para
+        todo el tramo y se reparte por meses. Devuelve (respuestas por tramo, respuesta entera);
+        las respuestas por tramo son None si el formato no se puede repartir.
+        """
+        data = self._fetch(icc, run[0][0], run[-1][1], monthly, limiter)
+        if len(run) == 1:
+            # Un solo mes: no hay nada que repartir
+            parts = [data] if isinstance(data, (list, dict)) else None
+        else:
+            parts = split(data, run)
+        if parts is not None:
+            for (s, e), part in zip(run, parts):
+                self._store_closed(self._path(icc, monthly, s, e), part)
+        return parts, data
+
+    def get(self, icc, start_date, end_date, monthly, today=None, limiter=None):
+        """
+        Histórico de [start_date, end_date] (YYYY-MM-DD) con la misma forma que el upstream.
+        limiter (opcional, con wait()): marca el ritmo de las peticiones reales al upstream.
+        """
+        start, end = parse_range(start_date, end_date)
+        today = today or date.today()
+        if (icc, monthly) in self._unsegmented:
+            return self._live(icc, start, end, monthly, limiter)
+
+        segments = month_segments(start, end)
+        parts = [None] * len(segments)
+        missing = []
+        for i, (s, e) in enumerate(segments):
+            if is_closed(e, monthly, today, Settings.M2M_HISTORY_GRACE_DAYS):
+                parts[i] = self._load_closed(self._path(icc, monthly, s, e))
+                if parts[i] is None:
+                    missing.append(i)
+            else:
+                parts[i] = self._live(icc, s, e, monthly, limiter)
+
+        # Huecos consecutivos de tramos cerrados: una petición por hueco, no una por mes
+        for _, run in itertools.groupby(enumerate(missing), key=lambda pair: pair[1] - pair[0]):
+            idx = [i for _, i in run]
+            run_parts, data = self._fetch_closed(icc, [segments[i] for i in idx], monthly, limiter)
+            if run_parts is None:
+                return self._unsegment(icc, start, end, monthly, limiter, data if len(idx) == len(segments) else None)
+            for i, part in zip(idx, run_parts):
+                parts[i] = part
+
+        stitched = stitch(parts)
+        if stitched is None:
+            return self._unsegment(icc, start, end, monthly, limiter)
+        return stitched
+
+    def _unsegment(self, icc, start, end, monthly, limiter=None, data=None):
+        """
+        Formato que no se puede repartir ni unir por meses: a partir de ahora esta SIM
+        se pide por rango completo (con el TTL del tramo vivo) y no se escribe en disco.
+        """
+        print(f"⚠️ Histórico de {icc} con formato no combinable; se consulta el rango completo")
+        with self._lock:
+            self._unsegmented.add((icc, monthly))
+        if data is not None:
+            return data
+        return self._live(icc, start, end, monthly, limiter)
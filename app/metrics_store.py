@@ -0,0 +1,270 @@
+# Archivo: app/metrics_store.py
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from app.config.settings import Settings
+
+try:
+    import pyarrow  # noqa: F401  (solo para saber si hay soporte Parquet)
+    PARQUET = True
+except ImportError:
+    PARQUET = False
+
+
+# ----------------------------
+# Datasets: clave de entidad, dimensiones y métricas que se guardan
+# ----------------------------
+DATASETS = {
+    "devices": {"key": "uuid", "dims": ["type", "organization", "model"], "metrics": ["status_clean"]},
+    "sims":    {"key": "icc", "dims": ["organization", "status_clean"], "metrics": ["cons_daily", "cons_month"]},
+    "pools":   {"key": "pool_id", "dims": ["organization"], "metrics": ["usage_percent", "bytes_consumed", "bytes_limit"]},
+    "boards":  {"key": "uuid", "dims": [], "metrics": ["free_ram_mb", "sys_temp_c"]},
+}
+
+BUCKET_FREQ = {
+    "hour": "h",
+    "day": "D",
+    "week": "W-MON",
+    "month": "MS",
+}
+
+AGGREGATIONS = ("mean", "sum", "min", "max", "count", "last", "nunique")
+
+TS_COLUMN = "ts"
+
+
+def _text_columns(dataset):
+    spec = DATASETS[dataset]
+    return [spec["key"]] + spec["dims"]
+
+
+class MetricsStore:
+    """
+    Almacén local append-only de métricas por entidad, particionado por día:
+        <root>/<dataset>/<YYYY-MM-DD>/<HHMMSS>_<n>.parquet
+    Parquet si pyarrow está instalado; si no, CSV comprimido (.csv.gz).
+    Las consultas solo leen las particiones del rango y nunca llaman a Kiconex.
+    La ingesta (y su compactación) corre en otro proceso que la API: el lock
+    solo protege dentro de un proceso, así que la lectura tolera ficheros que
+    desaparecen y, si existe day.*, ignora los sueltos ya incluidos en él.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or Settings.METRICS_STORE_DIR
+        self.ext = ".parquet" if PARQUET else ".csv.gz"
+        self._lock = threading.Lock()
+
+    # ----------------------------
+    # Escritura
+    # ----------------------------
+    def _day_dir(self, dataset, day):
+        return os.path.join(self.root, dataset, day.isoformat())
+
+    def _write(self, df, path):
+        tmp = f"{path}.tmp"
+        if PARQUET:
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_csv(tmp, index=False, compression="gzip")
+        os.replace(tmp, path)
+
+    def _read(self, path, columns=None, text_columns=()):
+        # Fichero completo y después las columnas pedidas: una partición anterior a
+        # una columna nueva no la tiene (queda a NaN en lugar de fallar)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            # Clave y dimensiones como texto (los ICC no caben en int64)
+            df = pd.read_csv(path, compression="gzip", dtype={c: str for c in text_columns})
+            if TS_COLUMN in df.columns:
+                df[TS_COLUMN] = pd.to_datetime(df[TS_COLUMN])
+        if columns is not None:
+            df = df.reindex(columns=columns)
+        return df
+
+    def append(self, dataset, df, ts=None):
+        """Añade una foto del dataset (una fila por entidad) con marca de tiempo ts."""
+        spec = DATASETS[dataset]
+        if df is None or df.empty or spec["key"] not in df.columns:
+            return 0
+        ts = ts or datetime.now()
+        cols = [c for c in [spec["key"]] + spec["dims"] + spec["metrics"] if c in df.columns]
+        out = df[cols].copy()
+        out.insert(0, TS_COLUMN, pd.Timestamp(ts))
+        for col in spec["dims"] + [spec["key"]]:
+            if col in out.columns:
+                out[col] = out[col].astype(str)
+
+        day_dir = self._day_dir(dataset, ts.date())
+        with self._lock:
+            os.makedirs(day_dir, exist_ok=True)
+            n = len(os.listdir(day_dir))
+            path = os.path.join(day_dir, f"{ts:%H%M%S}_{n}{self.ext}")
+            self._write(out, path)
+        return len(out)
+
+    def compact(self, dataset, day):
+        """Une los ficheros de un día cerrado en uno solo (menos ficheros que abrir al consultar)."""
+        day_dir = self._day_dir(dataset, day)
+        with self._lock:
+            files = self._files(day_dir)
+            # Sueltos que ya están en day.* pero no se llegaron a borrar (compactación cortada)
+            for f in self._stale_files(day_dir, files):
+                self._remove(f)
+            if len(files) < 2:
+                return 0
+            text_columns = _text_columns(dataset)
+            df = pd.concat([self._read(f, text_columns=text_columns) for f in files], ignore_index=True)
+            df = df.sort_values(TS_COLUMN, kind="stable")
+            # Primero el fichero del día (escritura atómica con os.replace), después se borran
+            # los sueltos. Mientras tanto los lectores ya ignoran los sueltos anteriores al
+            # day.* (ver _files), así que nunca cuentan dos veces ni pierden filas
+            path = os.path.join(day_dir, f"day{self.ext}")
+            self._write(df, path)
+            for f in files:
+                if f != path:
+                    self._remove(f)
+        return len(files)
+
+    def _stale_files(self, day_dir, live):
+        if not os.path.isdir(day_dir):
+            return []
+        return [
+            os.path.join(day_dir, f) for f in os.listdir(day_dir)
+            if f.endswith((".parquet", ".csv.gz")) and os.path.join(day_dir, f) not in live
+        ]
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def compact_closed(self, dataset, today=None):
+        """Compacta todos los días anteriores a hoy que tengan varios ficheros."""
+        today = today or datetime.now().date()
+        total = 0
+        for day in self.days(dataset):
+            if day < today:
+                total += self.compact(dataset, day)
+        return total
+
+    # ----------------------------
+    # Lectura
+    # ----------------------------
+    def _files(self, day_dir):
+        """
+        Ficheros vigentes del día. Si hay un day.* (compactado), los sueltos
+        anteriores a él ya están dentro y se ignoran aunque aún no se hayan borrado.
+        """
+        if not os.path.isdir(day_dir):
+            return []
+        files = sorted(
+            os.path.join(day_dir, f) for f in os.listdir(day_dir)
+            if f.endswith((".parquet", ".csv.gz"))
+        )
+        day_files = [f for f in files if os.path.basename(f).startswith("day.")]
+        if not day_files:
+            return files
+        try:
+            compacted_at = os.path.getmtime(day_files[0])
+        except FileNotFoundError:
+            return files
+        out = []
+        for f in files:
+            if f in day_files:
+                out.append(f)
+                continue
+            try:
+                if os.path.getmtime(f) > compacted_at:
+                    out.append(f)
+            except FileNotFoundError:
+                continue
+        return out
+
+    def _read_day(self, dataset, day, columns=None, attempts=3):
+        """Frames de un día; si un fichero desaparece a mitad (compactación en otro proceso), se relista."""
+        day_dir = self._day_dir(dataset, day)
+        for attempt in range(attempts):
+            try:
+                return [
+                    self._read(path, columns=columns, text_columns=_text_columns(dataset))
+                    for path in self._files(day_dir)
+                ]
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+        return []
+
+    def days(self, dataset):
+        base = os.path.join(self.root, dataset)
+        if not os.path.isdir(base):
+            return []
+        out = []
+        for name in sorted(os.listdir(base)):
+            try:
+                out.append(datetime.strptime(name, "%Y-%m-%d").date())
+            except ValueError:
+                continue
+        return out
+
+    def read(self, dataset, start, end, columns=None, where=None):
+        """
+        Filas de [start, end] leyendo solo las particiones de esos días.
+        where: {columna: valor | [valores]} sobre dimensiones o clave.
+        """
+        if dataset not in DATASETS:
+            raise ValueError(f"Dataset desconocido: {dataset}. Disponibles: {sorted(DATASETS)}")
+        wanted = None
+        if columns:
+            wanted = list(dict.fromkeys([TS_COLUMN] + list(columns) + list((where or {}).keys())))
+
+        frames = []
+        # Solo los días que existen: un rango amplio (from=0001-01-01) no recorre el calendario
+        for day in self.days(dataset):
+            if start.date() <= day <= end.date():
+                frames.extend(self._read_day(dataset, day, columns=wanted))
+        if not frames:
+            return pd.DataFrame(columns=wanted or [TS_COLUMN])
+
+        df = pd.concat(frames, ignore_index=True)
+        mask = (df[TS_COLUMN] >= pd.Timestamp(start)) & (df[TS_COLUMN] <= pd.Timestamp(end))
+        for col, value in (where or {}).items():
+            values = value if isinstance(value, list) else [value]
+            mask &= df[col].astype(str).isin([str(v) for v in values])
+        return df[mask].reset_index(drop=True)
+
+    def aggregate(self, dataset, metric, start, end, bucket="hour", agg="mean", group_by=None, where=None):
+        """
+        Serie agregada de `metric` por bucket de tiempo (y opcionalmente por dimensiones).
+        bucket: raw | hour | day | week | month. agg: mean | sum | min | max | count | last | nunique.
+        """
+        spec = DATASETS.get(dataset)
+        if spec is None:
+            raise ValueError(f"Dataset desconocido: {dataset}. Disponibles: {sorted(DATASETS)}")
+        allowed = [spec["key"]] + spec["dims"] + spec["metrics"]
+        group_by = list(group_by or [])
+        for col in [metric] + group_by + list((where or {}).keys()):
+            if col not in allowed:
+                raise ValueError(f"Columna desconocida en {dataset}: {col}")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"agg debe ser uno de {list(AGGREGATIONS)}")
+        if bucket != "raw" and bucket not in BUCKET_FREQ:
+            raise ValueError(f"bucket debe ser raw o uno de {sorted(BUCKET_FREQ)}")
+
+        df = self.read(dataset, start, end, columns=[metric] + group_by, where=where)
+        if df.empty:
+            return []
+        if agg in ("mean", "sum") and not pd.api.types.is_numeric_dtype(df[metric]):
+            raise ValueError(f"'{metric}' no es numérica: usa count, last o nunique")
+
+        time_key = TS_COLUMN if bucket == "raw" else pd.Grouper(key=TS_COLUMN, freq=BUCKET_FREQ[bucket])
+        grouped = df.groupby([time_key] + group_by, sort=True)[metric]
+        result = grouped.agg(agg).reset_index().rename(columns={metric: "value"})
+        result[TS_COLUMN] = result[TS_COLUMN].dt.strftime("%Y-%m-%dT%H:%M:%S")
+        result = result.astype(object).where(pd.notnull(result), None)
+        return result.to_dict(orient="records")
@@ -0,0 +1,71 @@
+# Archivo: app/snapshots.py
+import threading
+import time
+
+
+class SnapshotCache:
+    """
+    Caché en memoria de datasets ya procesados, con TTL.
+    Cada clave se reconstruye como mucho una vez a la vez (lock por clave),
+    así varias peticiones simultáneas no disparan varias descargas a Kiconex.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}  # clave -> (timestamp de construcción, valor)
+        self._generations = {}  # clave -> nº de invalidaciones (detecta las que llegan durante un build)
+        self._generation = 0    # invalidaciones globales (invalidate() sin clave)
+        self._locks = {}
+        self._global_lock = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._global_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _stamp(self, key):
+        return (self._generation, self._generations.get(key, 0))
+
+    def _fresh(self, key):
+        with self._global_lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        built_at, value = entry
+        if time.monotonic() - built_at > self.ttl:
+            return None
+        return entry
+
+    def get(self, key, builder):
+        """Devuelve el snapshot de 'key'; si no existe o ha caducado lo construye con builder()."""
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry[1]
+
+        with self._lock_for(key):
+            # Otro hilo puede haberlo reconstruido mientras esperábamos
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[1]
+
+            with self._global_lock:
+                stamp = self._stamp(key)
+            start = time.perf_counter()
+            value = builder()
+            with self._global_lock:
+                # Si se invalidó mientras se construía, el valor puede ser anterior a la
+                # invalidación: se entrega a quien lo pidió pero no se guarda
+                if self._stamp(key) == stamp:
+                    self._entries[key] = (time.monotonic(), value)
+            print(f"🔄 Snapshot '{key}' reconstruido en {time.perf_counter() - start:.2f}s")
+            return value
+
+    def invalidate(self, key=None):
+        with self._global_lock:
+            if key is None:
+                self._entries = {}
+                self._generation += 1
+            else:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
@@ -1,26 +1,46 @@
 # Archivo: main.py
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel # <--- NECESARIO PARA EL BODY DEL POST
 import pandas as pd
 import numpy as np
 import math
+import json
+from datetime import datetime
+from typing import Optional, List, Dict, Any
 
 
 # 1. Imports de tu proyecto
 from app.api_client import CoreClient
 from app.database import DatabaseAdapter
-from app.logic.data_info import process_devicesInfo 
+from app.database_async import AsyncDatabaseAdapter
+from app.config.settings import Settings
+from app.logic.data_info import device_info_cache
 from app.logic.data_device import prepare_boards, prepare_kiwi
 from app.logic.data_m2m import process_m2m
 from app.logic.data_pool import process_pools
-from app.logic.data_renewal import process_m2m_renewals_logic, process_plan_renewals_logic  
+from app.logic.data_renewal import process_m2m_renewals_logic, process_plan_renewals_logic, RenewalIndex, date_bound
+from app.snapshots import SnapshotCache
+from app.change_feed import ChangeFeedRegistry
 from app.logic.data_inst import process_installations
+from app.logic.data_fleet import build_fleet
+from app.logic.downsample import downsample_records, downsample_chart
+from app.alarm_rollups import group_breakdown
+from app.m2m_history import M2MHistoryCache, parse_range
+from app.metrics_store import MetricsStore, DATASETS as METRIC_DATASETS
+from app.logic.m2m_batch import select_iccs, history_points, aggregate_periods, iter_batch_history, RateLimiter
 # Instancia global del cliente
 
 client = CoreClient()
 db = DatabaseAdapter()
+async_db = AsyncDatabaseAdapter()
+snapshots = SnapshotCache(ttl=Settings.SNAPSHOT_TTL)
+m2m_history = M2MHistoryCache(client)
+metrics_store = MetricsStore()
+change_feeds = ChangeFeedRegistry(max_deltas=Settings.CHANGE_FEED_DEPTH)
 
 class HistoryRequest(BaseModel):
     start_date: str # Debería ser formato YYYY-MM-DD
@@ -31,7 +51,13 @@ class HistoryRequest(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print(" 🚀 Iniciando Analytics Service (Modo API Token)...")
+    if Settings.DB_ASYNC:
+        try:
+            await async_db.open()
+        except Exception as e:
+            print(f"⚠️ Pool MySQL async no disponible, se usa el adaptador síncrono: {e}")
     yield
+    await async_db.close()
     print(" 🛑 Apagando servicio...")
 
 app = FastAPI(lifespan=lifespan)
@@ -53,6 +79,15 @@ class HistoryRequest(BaseModel):
     end_date: str
     monthly: bool
 
+class BatchHistoryRequest(BaseModel):
+    start_date: str
+    end_date: str
+    monthly: bool = False
+    organization: Optional[str] = None            # organización del frame de process_m2m
+    iccs: Optional[List[str]] = None              # lista explícita de ICCs
+    filters: Optional[Dict[str, Any]] = None      # {columna de process_m2m: valor | [valores]}
+    include_series: bool = True                   # False: solo el resumen agregado
+
 # --- HELPER "NUCLEAR" PARA LIMPIAR NaN ---
 def clean_df(df):
     """
@@ -65,6 +100,50 @@ def clean_df(df):
     df_obj_clean = df_obj.where(pd.notnull(df_obj), None)
     return df_obj_clean
 
+# --- HELPER PARA RENOVACIONES DESDE SNAPSHOT ---
+def _renewals_from_index(index: RenewalIndex, due_within, from_date, to, limit, offset):
+    """Resuelve ?due_within= o ?from=&to= con búsqueda binaria sobre el índice del snapshot."""
+    for value in (from_date, to):
+        if not value:
+            continue
+        try:
+            date_bound(value)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="from/to deben ser fechas ISO 8601 (YYYY-MM-DD)")
+    if due_within is not None:
+        data = index.due_within(due_within)
+    else:
+        data = index.between(from_date, to)
+
+    return {
+        "data": data[offset: offset + limit] if offset < len(data) else [],
+        "total": len(data),
+        "all_data": data
+    }
+
+# --- HELPER PARA RANGOS from/to DE HISTÓRICOS ---
+def _history_range(from_date, to):
+    """
+    Parsea from/to (ISO 8601, to por defecto ahora) a datetimes naive en hora local,
+    como los timestamps guardados: un offset explícito (+02:00) se convierte, no se compara.
+    """
+    try:
+        start = datetime.fromisoformat(from_date)
+        end = datetime.fromisoformat(to) if to else datetime.now()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to deben ser fechas ISO 8601 (YYYY-MM-DD[THH:MM:SS])")
+    start, end = [d.astimezone().replace(tzinfo=None) if d.tzinfo else d for d in (start, end)]
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' debe ser posterior a 'from'")
+    return start, end
+
+# --- HELPER PARA ACCESO A BD DESDE ENDPOINTS ASYNC ---
+async def db_call(method, *args, **kwargs):
+    """Usa el pool async si está abierto; si no, el adaptador síncrono en el threadpool."""
+    if async_db.is_open:
+        return await getattr(async_db, method)(*args, **kwargs)
+    return await run_in_threadpool(getattr(db, method), *args, **kwargs)
+
 # --- HELPER PARA PAGINACIÓN ---
 def paginate_df(df: pd.DataFrame, limit: int, offset: int):
     """
@@ -78,31 +157,107 @@ def paginate_df(df: pd.DataFrame, limit: int, offset: int):
     
     return df.iloc[offset : offset + limit]
 
+# --- DATASETS CON FEED DE CAMBIOS ---
+_FRAME_MEMO = {}   # dataset -> (huellas de las URLs de origen, frame procesado)
+
+def _unchanged_or_build(name, urls, build):
+    """
+    Reutiliza el frame procesado si ninguna URL de origen ha cambiado desde el
+    último refresco (ETag / hash del cuerpo en CoreClient); si no, lo reconstruye.
+    """
+    signature = tuple(client.fingerprint(u) for u in urls)
+    memo = _FRAME_MEMO.get(name)
+    if memo is not None and None not in signature and memo[0] == signature:
+        return memo[1]
+    df = build()
+    _FRAME_MEMO[name] = (signature, df)
+    return df
+
+def _build_devices_frame():
+    raw_devices = client.get_devicesB()
+    if not raw_devices:
+        return pd.DataFrame()
+    raw_models = client.get_deviceModels()
+    raw_software = client.get_deviceSoftware()
+    return _unchanged_or_build(
+        "devices", [Settings.URL_DEVICES, Settings.URL_MODEL_B, Settings.URL_VERSION_K],
+        lambda: clean_df(prepare_boards(raw_devices, df_models=pd.DataFrame(raw_models), df_soft=pd.DataFrame(raw_software))),
+    )
+
+def _build_kiwi_frame():
+    raw_kiwi = client.get_devicesKiwi()
+    if not raw_kiwi:
+        return pd.DataFrame()
+    raw_software = client.get_deviceSoftware()
+    return _unchanged_or_build(
+        "kiwi", [Settings.URL_DEVICES2, Settings.URL_VERSION_K],
+        lambda: clean_df(prepare_kiwi(raw_kiwi, df_soft=pd.DataFrame(raw_software))),
+    )
+
+def _build_m2m_frame():
+    raw_m2m = client.get_m2m()
+    return _unchanged_or_build("m2m", [Settings.URL_M2M], lambda: clean_df(process_m2m(raw_m2m)))
+
+def _build_pools_frame():
+    raw_pool = client.get_pools()
+    return _unchanged_or_build("pools", [Settings.URL_POOL], lambda: clean_df(process_pools(raw_pool)))
+
+def _build_installations_frame():
+    raw_installations = client.get_installations()
+    return _unchanged_or_build(
+        "installations", [Settings.URL_INSTAL], lambda: clean_df(process_installations(raw_installations))
+    )
+
+def _build_renewals_frame(snapshot_key, build_index):
+    """Renovaciones del snapshot completo (showAll) como frame; comparte el índice con los endpoints."""
+    index = snapshots.get(snapshot_key, build_index)
+    return clean_df(pd.DataFrame(index.records))
+
+def _build_info_frame():
+    """devices_info completo (sin el blob info) en streaming; solo se construye al pedir /changes?dataset=info."""
+    projection = db.device_info_projection() if Settings.INFO_DB_EXTRACT else None
+    chunks = db.iter_device_info(columns=projection, chunk_size=Settings.DB_STREAM_CHUNK)
+    return clean_df(device_info_cache.process_chunks(chunks, keep_info=False))
+
+# dataset -> (columna clave, constructor del frame procesado completo)
+CHANGE_DATASETS = {
+    "devices": ("uuid", _build_devices_frame),
+    "kiwi": ("uuid", _build_kiwi_frame),
+    "m2m": ("icc", _build_m2m_frame),
+    "pools": ("pool_id", _build_pools_frame),
+    "installations": ("uuid", _build_installations_frame),
+    "renewals_m2m": ("order_id", lambda: _build_renewals_frame("renewals_m2m", _build_m2m_renewals_index)),
+    "renewals_plan": ("order_id", lambda: _build_renewals_frame("renewals_plan", _build_plan_renewals_index)),
+    "info": ("id", _build_info_frame),
+}
+
+def _refresh_dataset(name, response=None):
+    """Descarga y procesa el dataset, registra el delta y expone la versión en X-Dataset-Version."""
+    key_column, builder = CHANGE_DATASETS[name]
+    df = builder()
+    version = change_feeds.record(name, key_column, df)
+    if response is not None:
+        response.headers["X-Dataset-Version"] = version
+    return df
+
+def _dataset_snapshot(name):
+    """Frame procesado reutilizado durante SNAPSHOT_TTL (un refresco = un delta en el feed)."""
+    return snapshots.get(f"frame:{name}", lambda: _refresh_dataset(name))
+
 # ==========================================
 # ENDPOINT 1: DEVICES (Boards)
 # ==========================================
 @app.get("/internal/dashboard/devices")
 def get_devices_dashboard(
+    response: Response,
     limit: int = Query(5000, ge=1, description="Cantidad de registros a traer"),
     offset: int = Query(0, ge=0, description="Desde qué registro empezar")
 ):
-    raw_devices = client.get_devicesB()
-    raw_models = client.get_deviceModels()
-    raw_software = client.get_deviceSoftware()
-
-    if not raw_devices:
-        return []
-
-    df_models = pd.DataFrame(raw_models)
-    df_soft = pd.DataFrame(raw_software)
-
     try:
-        # Lógica de negocio
-        df_final = prepare_boards(raw_devices, df_models=df_models, df_soft=df_soft)
-        
-        # Limpieza 
-        df_final = clean_df(df_final)
-        
+        df_final = _refresh_dataset("devices", response)
+        if df_final.empty:
+            return []
+
         # Paginación
         df_final = paginate_df(df_final, limit, offset)
         
@@ -118,21 +273,15 @@ def get_devices_dashboard(
 # ==========================================
 @app.get("/internal/dashboard/kiwi")
 def get_kiwi_dashboard(
+    response: Response,
     limit: int = Query(5000, ge=1),
     offset: int = Query(0, ge=0)
 ):
-    raw_kiwi = client.get_devicesKiwi()
-    raw_software = client.get_deviceSoftware()
-    
-    if not raw_kiwi:
-        return []
-
-    df_soft = pd.DataFrame(raw_software)
-
     try:
-        df_final = prepare_kiwi(raw_kiwi, df_soft=df_soft)
-        df_final = clean_df(df_final)
-        
+        df_final = _refresh_dataset("kiwi", response)
+        if df_final.empty:
+            return []
+
         # Paginación
         df_final = paginate_df(df_final, limit, offset)
         
@@ -146,18 +295,32 @@ def get_kiwi_dashboard(
 # ==========================================
 # ENDPOINT 2: INFO
 # ==========================================
+def _device_info_full(projection, limit, offset):
+    chunks = db.iter_device_info(columns=projection, chunk_size=Settings.DB_STREAM_CHUNK)
+    # Solo la ventana [offset, offset + limit) se queda en memoria; el resto solo refresca la caché
+    df_final = device_info_cache.process_chunks(chunks, keep_info=False, offset=offset, limit=limit)
+    df_final = clean_df(df_final)
+    return df_final.to_dict(orient="records")
+
+def _device_info_page(rows):
+    df_final = device_info_cache.process_page(rows, keep_info=False)
+    return clean_df(df_final).to_dict(orient="records")
+
 @app.get("/internal/dashboard/info")
-def get_all_device_info(
+async def get_all_device_info(
     limit: int = Query(5000, ge=1),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    after_id: Optional[int] = Query(None, ge=0, description="Paginación por clave: filas con id > after_id (ignora offset)")
 ):
     try:
-        raw_info = db.get_all_device_info()
+        # Con INFO_DB_EXTRACT se leen las columnas generadas en lugar del blob 'info'
+        projection = await db_call("device_info_projection") if Settings.INFO_DB_EXTRACT else None
         try:
-            df_final = process_devicesInfo(raw_info)
-            df_final = clean_df(df_final)
-            df_final = paginate_df(df_final, limit, offset)
-            return df_final.to_dict(orient="records")
+            if after_id is not None:
+                rows = await db_call("get_device_info_page", after_id, limit, columns=projection)
+                return await run_in_threadpool(_device_info_page, rows)
+            # Lectura completa en streaming (cursor sin buffer) + procesado en el threadpool
+            return await run_in_threadpool(_device_info_full, projection, limit, offset)
         except ValueError as ve:
             print(f"❌ Error lógico en Device Info: {ve}")
             raise HTTPException(status_code=400, detail=str(ve))
@@ -170,13 +333,12 @@ def get_all_device_info(
 # ==========================================
 @app.get("/internal/dashboard/m2m")
 def get_m2m_dashboard(
+    response: Response,
     limit: int = Query(5000, ge=1),
     offset: int = Query(0, ge=0)
 ):
-    raw_m2m = client.get_m2m()
     try:
-        df_final = process_m2m(raw_m2m)
-        df_final = clean_df(df_final)
+        df_final = _refresh_dataset("m2m", response)
         
         df_final = paginate_df(df_final, limit, offset)
         
@@ -193,7 +355,8 @@ def get_m2m_dashboard(
 @app.post("/internal/dashboard/m2m/{icc}/history")
 def get_m2m_history_dashboard(
     icc: str,
-    payload: HistoryRequest
+    payload: HistoryRequest,
+    max_points: Optional[int] = Query(None, ge=3, description="Reducir la serie con LTTB a como mucho N puntos")
 ):
     try:
         clean_icc = icc.strip()
@@ -203,8 +366,8 @@ def get_m2m_history_dashboard(
         if "string" in payload.start_date or not payload.start_date:
              raise HTTPException(status_code=400, detail="Debes enviar fechas reales (YYYY-MM-DD), no 'string'")
 
-        data = client.get_m2m_history(clean_icc, payload.model_dump())
-        return data
+        data = m2m_history.get(clean_icc, payload.start_date, payload.end_date, payload.monthly)
+        return downsample_chart(data, max_points)
 
     except ValueError as ve:
         # Capturamos el error lógico de Kiconex
@@ -213,18 +376,67 @@ def get_m2m_history_dashboard(
         print(f"❌ Error Server: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+# ==========================================
+# ENDPOINT 3.2: M2M HISTORY (LOTE)
+# ==========================================
+@app.post("/internal/dashboard/m2m/history/batch")
+def get_m2m_history_batch(payload: BatchHistoryRequest):
+    """
+    Histórico de consumo de un conjunto de SIMs (organización, lista de ICCs o
+    filtro sobre el frame M2M). Respuesta NDJSON: una línea por SIM según van
+    terminando y una línea final "summary" con totales/percentiles por periodo.
+    """
+    if not (payload.organization or payload.iccs or payload.filters):
+        raise HTTPException(status_code=400, detail="Indica organization, iccs o filters")
+    try:
+        # Fechas validadas una vez aquí: un error es un 400, no una línea de error por SIM
+        parse_range(payload.start_date, payload.end_date)
+        df_m2m = _dataset_snapshot("m2m") if (payload.organization or payload.filters) else None
+        iccs = select_iccs(df_m2m, payload.organization, payload.iccs, payload.filters)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if len(iccs) > Settings.M2M_BATCH_MAX_SIMS:
+        raise HTTPException(status_code=400, detail=f"Demasiadas SIMs en el lote ({len(iccs)} > {Settings.M2M_BATCH_MAX_SIMS})")
+
+    # Un limitador por lote: solo pasan por él las peticiones reales a Kiconex (tramos sin caché)
+    limiter = RateLimiter(Settings.M2M_BATCH_RATE)
+
+    def _fetch(icc):
+        return m2m_history.get(icc, payload.start_date, payload.end_date, payload.monthly, limiter=limiter)
+
+    def _stream():
+        points_by_icc = {}
+        errors = 0
+        for icc, data, error in iter_batch_history(_fetch, iccs, concurrency=Settings.M2M_BATCH_CONCURRENCY):
+            if error:
+                errors += 1
+                yield json.dumps({"icc": icc, "error": error}) + "\n"
+                continue
+            points_by_icc[icc] = history_points(data)
+            if payload.include_series:
+                yield json.dumps({"icc": icc, "data": data}, default=str) + "\n"
+        summary = {
+            "sims": len(iccs),
+            "ok": len(points_by_icc),
+            "errors": errors,
+            "periods": aggregate_periods(points_by_icc),
+        }
+        yield json.dumps({"summary": summary}) + "\n"
+
+    print(f"📦 Histórico en lote para {len(iccs)} SIMs")
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
 # ==========================================
 # ENDPOINT 4: POOLS
 # ==========================================
 @app.get("/internal/dashboard/pools")
 def get_pools_dashboard(
+    response: Response,
     limit: int = Query(5000, ge=1),
     offset: int = Query(0, ge=0)
 ):
-    raw_pool = client.get_pools()
     try:
-        df_pool = process_pools(raw_pool)
-        df_pool = clean_df(df_pool)
+        df_pool = _refresh_dataset("pools", response)
         
         df_pool_paginated = paginate_df(df_pool, limit, offset)
         
@@ -238,6 +450,27 @@ def get_pools_dashboard(
 # ==========================================
 # ENDPOINT 5: RENEWALS M2M Y PLAN
 # ==========================================
+def _build_m2m_renewals_index():
+    """Snapshot completo (rango showAll) de renovaciones M2M, indexado por date_to_renew."""
+    m2m_data = process_m2m_renewals_logic(
+        client.get_m2m_renewals(show_all=True),
+        client.get_m2m(),
+        client.get_devicesB(),
+        client.get_deviceModels(),
+        client.get_deviceSoftware(),
+    )
+    return RenewalIndex(m2m_data)
+
+def _build_plan_renewals_index():
+    """Snapshot completo (rango showAll) de renovaciones de plan, indexado por date_to_renew."""
+    plan_data = process_plan_renewals_logic(
+        client.get_plan_renewals(show_all=True),
+        client.get_devicesB(),
+        client.get_deviceModels(),
+        client.get_deviceSoftware(),
+    )
+    return RenewalIndex(plan_data)
+
 @app.get("/internal/dashboard/renewals/m2m")
 def get_m2m_renewals_dashboard(
     limit: int = Query(5000, ge=1),
@@ -246,8 +479,14 @@ def get_m2m_renewals_dashboard(
     from_date: str = Query("1970-01-01"),
     to: str = Query("2100-12-31"),
     raw: bool = Query(False),
+    due_within: Optional[int] = Query(None, ge=0, description="Renovaciones en los próximos N días (snapshot indexado)"),
+    due_from: Optional[str] = Query(None, alias="from", description="date_to_renew >= from (snapshot indexado, usa 'to' como fin)"),
 ):
     try:
+        if not raw and (due_within is not None or due_from is not None):
+            index = snapshots.get("renewals_m2m", _build_m2m_renewals_index)
+            return _renewals_from_index(index, due_within, due_from, to, limit, offset)
+
         raw_m2m_ren = client.get_m2m_renewals(show_all=show_all, from_date=from_date, to=to)
 
         if raw:
@@ -276,6 +515,8 @@ def get_m2m_renewals_dashboard(
             "all_data": m2m_data
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -287,8 +528,14 @@ def get_plan_renewals_dashboard(
     from_date: str = Query(None),
     to: str = Query(None),
     raw: bool = Query(False),
+    due_within: Optional[int] = Query(None, ge=0, description="Renovaciones en los próximos N días (snapshot indexado)"),
+    due_from: Optional[str] = Query(None, alias="from", description="date_to_renew >= from (snapshot indexado, usa 'to' como fin)"),
 ):
     try:
+        if not raw and (due_within is not None or due_from is not None):
+            index = snapshots.get("renewals_plan", _build_plan_renewals_index)
+            return _renewals_from_index(index, due_within, due_from, to, limit, offset)
+
         raw_plan_ren = client.get_plan_renewals(show_all=show_all, from_date=from_date, to=to)
 
         if raw:
@@ -315,6 +562,8 @@ def get_plan_renewals_dashboard(
             "all_data": plan_data
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -323,12 +572,17 @@ def get_plan_renewals_dashboard(
 # ==========================================
 @app.get("/internal/dashboard/installations")
 def get_installations_dashboard(
+    response: Response,
     limit: int = Query(5000, ge=1),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    raw_epoch: bool = Query(False, description="Devolver last_change/first_connection como epoch (s)")
 ):
-    raw_installations = client.get_installations()
     try:
-        df_final = process_installations(raw_installations)
+        if raw_epoch:
+            # Formato alternativo: fuera del feed de cambios (que registra la versión ISO)
+            df_final = process_installations(client.get_installations(), raw_epoch=True)
+        else:
+            df_final = _refresh_dataset("installations", response)
         
         # Paginación
         df_final = paginate_df(df_final, limit, offset)
@@ -344,9 +598,9 @@ def get_installations_dashboard(
 # ENDPOINT 6: ALARM STATS
 # ==========================================
 @app.get("/internal/dashboard/alarms/stats")
-def get_alarm_stats():
+async def get_alarm_stats():
     try:
-        latest = db.get_latest_counts()
+        latest = await db_call("get_latest_counts")
         if not latest:
             return {
                 "disconnected_device": 0,
@@ -362,25 +616,113 @@ def get_alarm_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/internal/dashboard/alarms/history")
-def get_alarm_history(limit: int = 50):
+async def get_alarm_history(
+    limit: int = 50,
+    from_date: Optional[str] = Query(None, alias="from", description="Inicio del rango (ISO 8601)"),
+    to: Optional[str] = Query(None, description="Fin del rango (ISO 8601, por defecto ahora)"),
+    bucket: str = Query("auto", description="raw | hour | day | week | month | auto"),
+    max_points: Optional[int] = Query(None, ge=3, description="Reducir la serie con LTTB a como mucho N puntos"),
+):
     try:
-        history = db.get_history_counts(limit)
-        return history
+        # Sin rango: últimas N muestras (comportamiento original)
+        if from_date is None:
+            history = await db_call("get_history_counts", limit)
+            return downsample_records(history, max_points)
+
+        start, end = _history_range(from_date, to)
+
+        result = await db_call("get_alarm_history_range", start, end, bucket)
+        result["data"] = downsample_records(result["data"], max_points)
+        return result
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         print(f"❌ Error en Alarm History: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/internal/dashboard/alarms/breakdown")
+async def get_alarm_breakdown(
+    group_by: str = Query("organization", description="organization | model | organization_model"),
+    organization: Optional[str] = Query(None, description="Filtrar por organización (normalizada)"),
+):
+    try:
+        rows = await db_call("get_latest_breakdown")
+        data = group_breakdown(rows, group_by=group_by, organization=organization)
+        return {
+            "timestamp": rows[0]["snapshot_ts"] if rows else None,
+            "group_by": group_by,
+            "total": len(data),
+            "data": data,
+        }
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"❌ Error en Alarm Breakdown: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/internal/dashboard/metrics/datasets")
+def get_metric_datasets():
+    """Datasets del almacén local de métricas (scripts/ingest_metrics.py)."""
+    return {
+        name: {**spec, "days": [d.isoformat() for d in metrics_store.days(name)]}
+        for name, spec in METRIC_DATASETS.items()
+    }
+
+@app.get("/internal/dashboard/metrics/history")
+def get_metric_history(
+    dataset: str = Query(..., description="devices | sims | pools | boards"),
+    metric: str = Query(..., description="Columna a agregar (p.ej. cons_daily, usage_percent, status_clean)"),
+    from_date: str = Query(..., alias="from", description="Inicio del rango (ISO 8601)"),
+    to: Optional[str] = Query(None, description="Fin del rango (ISO 8601, por defecto ahora)"),
+    bucket: str = Query("hour", description="raw | hour | day | week | month"),
+    agg: str = Query("mean", description="mean | sum | min | max | count | last | nunique"),
+    group_by: Optional[str] = Query(None, description="Dimensiones separadas por comas (p.ej. organization,status_clean)"),
+    key: Optional[str] = Query(None, description="Solo esta entidad (uuid / icc / pool_id)"),
+    organization: Optional[str] = Query(None),
+):
+    """Series históricas del almacén local; nunca consulta Kiconex."""
+    start, end = _history_range(from_date, to)
+
+    where = {}
+    if dataset in METRIC_DATASETS:
+        if key:
+            where[METRIC_DATASETS[dataset]["key"]] = key
+        if organization:
+            where["organization"] = organization
+    groups = [g.strip() for g in group_by.split(",") if g.strip()] if group_by else None
+    try:
+        data = metrics_store.aggregate(dataset, metric, start, end, bucket=bucket, agg=agg, group_by=groups, where=where)
+        return {"dataset": dataset, "metric": metric, "bucket": bucket, "agg": agg, "total": len(data), "data": data}
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"❌ Error en Metrics History: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/internal/dashboard/metrics/upstream")
+def get_upstream_breakers():
+    """Estado de los circuit breakers y del hedging por endpoint de Kiconex."""
+    return {"breakers": client.breaker_stats(), "hedging": client.hedge_stats()}
+
+@app.get("/internal/dashboard/metrics/db")
+def get_db_pool_metrics():
+    """Espera y uso del pool de conexiones MySQL."""
+    return db.pool_stats()
+
 # ==========================================
 # ENDPOINT 7: installations
 # ==========================================
 @app.get("/internal/dashboard/installations")
 def get_installations_dashboard(
     limit: int = Query(5000, ge=1),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    raw_epoch: bool = Query(False, description="Devolver last_change/first_connection como epoch (s)")
 ):
     raw_installations = client.get_installations()
     try:
-        df_final = process_installations(raw_installations)
+        df_final = process_installations(raw_installations, raw_epoch=raw_epoch)
         
         # Paginación
         df_final = paginate_df(df_final, limit, offset)
@@ -392,6 +734,116 @@ def get_installations_dashboard(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==========================================
+# ENDPOINT 8: FLEET (vista unificada)
+# ==========================================
+def _build_fleet_index():
+    """Cruza boards, kiwi, m2m, instalaciones y renovaciones una vez por refresco."""
+    raw_models = client.get_deviceModels()
+    raw_software = client.get_deviceSoftware()
+    df_models = pd.DataFrame(raw_models)
+    df_soft = pd.DataFrame(raw_software)
+
+    raw_devices = client.get_devicesB()
+    raw_kiwi = client.get_devicesKiwi()
+    df_boards = prepare_boards(raw_devices, df_models=df_models, df_soft=df_soft) if raw_devices else None
+    df_kiwi = prepare_kiwi(raw_kiwi, df_soft=df_soft) if raw_kiwi else None
+
+    # Las renovaciones se reutilizan de sus propios snapshots
+    m2m_ren = snapshots.get("renewals_m2m", _build_m2m_renewals_index).records
+    plan_ren = snapshots.get("renewals_plan", _build_plan_renewals_index).records
+
+    fleet = build_fleet(
+        df_boards,
+        df_kiwi,
+        process_m2m(client.get_m2m()),
+        process_installations(client.get_installations()),
+        m2m_ren,
+        plan_ren,
+    )
+    # El índice de búsqueda se reconstruye con cada refresco, no en la primera búsqueda
+    fleet.search_index()
+    return fleet
+
+@app.get("/internal/dashboard/fleet")
+def get_fleet_dashboard(
+    limit: int = Query(5000, ge=1),
+    offset: int = Query(0, ge=0),
+    organization: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="status_clean del dispositivo"),
+    device_type: Optional[str] = Query(None, description="board | kiwi"),
+    has_sim: Optional[bool] = Query(None),
+):
+    try:
+        fleet = snapshots.get("fleet", _build_fleet_index)
+        data = fleet.filter(
+            organization=organization,
+            model=model,
+            status=status,
+            device_type=device_type,
+            has_sim=has_sim,
+        )
+        return {
+            "data": data[offset: offset + limit] if offset < len(data) else [],
+            "total": len(data),
+        }
+    except Exception as e:
+        print(f"❌ Error en Fleet: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/internal/dashboard/search")
+def search_dashboard(
+    q: str = Query(..., min_length=1, description="Nombre, uuid, ICC, cliente u organización (parcial)"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    try:
+        index = snapshots.get("fleet", _build_fleet_index).search_index()
+        results = index.search(q, limit=limit)
+        return {"query": q, "total": len(results), "data": results}
+    except Exception as e:
+        print(f"❌ Error en Search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/internal/dashboard/fleet/by-icc/{icc}")
+def get_fleet_by_icc(icc: str):
+    record = snapshots.get("fleet", _build_fleet_index).get_by_icc(icc)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"ICC {icc} no encontrado en la flota")
+    return record
+
+@app.get("/internal/dashboard/fleet/{uuid}")
+def get_fleet_by_uuid(uuid: str):
+    record = snapshots.get("fleet", _build_fleet_index).get(uuid)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Dispositivo {uuid} no encontrado en la flota")
+    return record
+
+
+# ==========================================
+# FEED DE CAMBIOS
+# ==========================================
+@app.get("/internal/dashboard/changes")
+def get_dataset_changes(
+    dataset: str = Query(..., description="devices | kiwi | m2m | pools | installations | renewals_m2m | renewals_plan | info"),
+    since: str = Query(..., description="Versión que ya tiene el cliente (cabecera X-Dataset-Version, '<epoch>-<n>')"),
+):
+    """
+    Altas, modificaciones y bajas del dataset desde la versión `since`.
+    Con resync=true (versión desconocida, demasiado antigua o de otro arranque del
+    servidor) el cliente debe volver a descargar el dataset completo; la respuesta
+    trae la versión actual para empezar a pedir deltas desde ahí.
+    """
+    if dataset not in CHANGE_DATASETS:
+        raise HTTPException(status_code=400, detail=f"dataset debe ser uno de {sorted(CHANGE_DATASETS)}")
+    try:
+        _dataset_snapshot(dataset)
+        return {"dataset": dataset, **change_feeds.get(dataset).changes(since)}
+    except Exception as e:
+        print(f"❌ Error en Changes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+import random
+import resource
+import subprocess
+import tempfile
+import time
+
+# Añadir la raíz del proyecto al path para poder importar desde 'app'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MODES = ["imports", "json", "orjson", "stream", "stream+projection"]
+CHUNK = 65536
+
+
+def make_body(n, seed=42):
+    """Cuerpo con la forma de /m2m (envoltorio Spring con content) y n SIMs."""
+    rnd = random.Random(seed)
+    content = []
+    for i in range(n):
+        content.append({
+            "icc": f"8934{i:015d}",
+            "msisdn": f"34{rnd.randint(600000000, 699999999)}",
+            "imsi": f"21407{rnd.randint(10**9, 10**10 - 1)}",
+            "alias": f"SIM {i}",
+            "lifeCycleStatus": rnd.choice(["ACTIVE", "DEACTIVATED", "TEST", "INVENTORY"]),
+            "servicePack": rnd.choice(["KICONEX_M2M", "KICONEX_IOT"]),
+            "ratType": rnd.choice(["2G", "3G", "4G", "LTE-M"]),
+            "customField1": rnd.choice(["", "Genaq Tech", "KEYTER", "Intarcon"]),
+            "commercialGroupId": rnd.randint(1, 40),
+            "presence": {"ipAddress": f"10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}",
+                         "level": rnd.choice(["GPRS", "IP", "UNKNOWN"]), "timestamp": 1760000000 + i},
+            "consumptionDaily": {"data": {"value": rnd.randint(0, 10**8), "limit": 0},
+                                 "sms": {"value": rnd.randint(0, 50), "limit": 0}},
+            "consumptionMonthly": {"data": {"value": rnd.randint(0, 10**10), "limit": 0},
+                                   "sms": {"value": rnd.randint(0, 500), "limit": 0}},
+            "alarms": [],
+            "apn": "kiconex.m2m", "operator": "Movistar", "country": "ES",
+            "activationDate": "2024-01-01T00:00:00Z", "provisionDate": "2023-12-01T00:00:00Z",
+            "shippedDate": "2023-11-20T00:00:00Z", "imei": f"35{rnd.randint(10**12, 10**13 - 1)}",
+            "basicServices": {"voice": False, "sms": True, "data": True},
+        })
+    return json.dumps({"content": content, "totalPages": 1, "last": True, "number": 0}).encode()
+
+
+def read_chunks(path):
+    """Lee el fichero por bloques, como iter_content sobre la respuesta."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def run(mode, path):
+    """
+    Decodifica el cuerpo con un modo y devuelve (segundos, pico de RSS del proceso en MB).
+    El modo "imports" solo carga los módulos: es la referencia sobre la que comparar.
+    """
+    import orjson
+    from app.json_stream import iter_json_array
+    from app.api_client import FIELD_PROJECTIONS, LIST_ENVELOPE_KEYS
+    from app.config.settings import Settings
+
+    chunks = read_chunks(path)
+
+    start = time.perf_counter()
+    if mode == "imports":
+        data = [path]
+    elif mode == "json":
+        data = json.loads(b"".join(chunks))
+    elif mode == "orjson":
+        data = orjson.loads(b"".join(chunks))
+    else:
+        project = None
+        if mode == "stream+projection":
+            fields = FIELD_PROJECTIONS[Settings.URL_M2M]
+            project = lambda rec: {k: rec[k] for k in fields if k in rec}
+        data = list(iter_json_array(chunks, envelope_keys=LIST_ENVELOPE_KEYS, project=project))
+    elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    assert len(data) and data
+    return elapsed, peak / 1024
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] in MODES:
+        elapsed, peak = run(sys.argv[1], sys.argv[2])
+        print(f"{elapsed:.3f} {peak:.1f}")
+        sys.exit(0)
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        f.write(make_body(n))
+    try:
+        print(f"{n} SIMs ({os.path.getsize(f.name) / 1e6:.1f} MB), bloques de {CHUNK} bytes, un proceso por modo")
+        print(f"{'modo':>18} | {'tiempo (s)':>10} | {'pico RSS (MB)':>13}")
+        for mode in MODES:
+            # ru_maxrss es por proceso: un subproceso por modo para que no se contaminen
+            out = subprocess.run([sys.executable, __file__, mode, f.name], capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{mode:>18} | {'error':>10} | {out.stderr.strip().splitlines()[-1]}")
+                continue
+            elapsed, peak = out.stdout.split()
+            print(f"{mode:>18} | {elapsed:>10} | {peak:>13}")
+    finally:
+        os.remove(f.name)
@@ -0,0 +1,70 @@
+import sys
+import os
+import random
+import time
+
+# Añadir la raíz del proyecto al path para poder importar desde 'app'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from app.logic.data_pool import process_pools, extract_sim, extract_consumo
+
+GROUPS = ["KICONEX SL", "Genaq Tech", "KEYTER", "Intarcon", "Otro Grupo", None]
+
+
+def make_pools(n, seed=42):
+    """Genera n pools con el mismo formato que devuelve /pools (dicts serializados como str)."""
+    rnd = random.Random(seed)
+    pools = []
+    for i in range(n):
+        total = rnd.randint(0, 500)
+        limit = rnd.choice([0, rnd.randint(1, 10**11)])
+        pools.append({
+            "pool_id": i,
+            "commercialGroup": rnd.choice(GROUPS),
+            "activeSim": str({"activeCards": rnd.randint(0, total), "totalSim": total}),
+            "consumedData": str({"consumedData": rnd.randint(0, 10**11), "limitData": limit}),
+        })
+    return pools
+
+
+def process_pools_rowwise(raw_data):
+    """Ruta anterior: ast.literal_eval + pd.Series por fila y apply(axis=1)."""
+    df = pd.DataFrame(raw_data)
+    sim_cols = df['activeSim'].apply(extract_sim)
+    usage_cols = df['consumedData'].apply(extract_consumo)
+    df_clean = pd.concat([df, sim_cols, usage_cols], axis=1)
+    for col in ['sims_active', 'sims_total', 'bytes_consumed', 'bytes_limit']:
+        df_clean[col] = df_clean[col].fillna(0).astype('int64')
+    df_clean['usage_percent'] = df_clean.apply(
+        lambda row: (row['bytes_consumed'] / row['bytes_limit'] * 100) if row['bytes_limit'] > 0 else 0.0,
+        axis=1
+    ).round(2)
+    return df_clean
+
+
+def timed(fn, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    cols = ['sims_active', 'sims_total', 'bytes_consumed', 'bytes_limit', 'usage_percent']
+
+    print(f"{'pools':>8} | {'row-wise (s)':>12} | {'bulk (s)':>9} | speedup")
+    for n in sizes:
+        data = make_pools(n)
+        t_old, old = timed(process_pools_rowwise, data, repeat=1)
+        t_new, new = timed(process_pools, data, repeat=3)
+
+        # Ambas rutas deben producir exactamente lo mismo
+        pd.testing.assert_frame_equal(
+            old[cols].reset_index(drop=True), new[cols].reset_index(drop=True), check_dtype=False
+        )
+        print(f"{n:>8} | {t_old:>12.3f} | {t_new:>9.3f} | x{t_old / t_new:.1f}")
@@ -0,0 +1,114 @@
+import sys
+import os
+import time
+import signal
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+# Añadir la raíz del proyecto al path para poder importar desde 'app'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.api_client import CoreClient
+from app.database import DatabaseAdapter
+from app.config.settings import Settings
+from app.metrics_store import MetricsStore, DATASETS
+from app.logic.data_device import prepare_boards, prepare_kiwi
+from app.logic.data_m2m import process_m2m
+from app.logic.data_pool import process_pools
+from app.logic.data_info import device_info_cache
+
+
+# ================================
+# RECOGIDA POR DATASET
+# ================================
+
+def collect_devices(core, db):
+    """Estado (status_clean) de boards y kiwi con organización y modelo."""
+    df_models = pd.DataFrame(core.get_deviceModels())
+    df_soft = pd.DataFrame(core.get_deviceSoftware())
+    df_boards = prepare_boards(core.get_devicesB(), df_models=df_models, df_soft=df_soft.copy())
+    df_kiwi = prepare_kiwi(core.get_devicesKiwi(), df_soft=df_soft.copy())
+    frames = []
+    for df, kind in ((df_boards, "board"), (df_kiwi, "kiwi")):
+        if not df.empty:
+            frames.append(df.assign(type=kind))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def collect_sims(core, db):
+    return process_m2m(core.get_m2m())
+
+def collect_pools(core, db):
+    return process_pools(core.get_pools())
+
+def collect_boards(core, db):
+    """free_ram_mb / sys_temp_c de devices_info (MySQL, no Kiconex)."""
+    projection = db.device_info_projection()
+    chunks = db.iter_device_info(columns=projection, chunk_size=Settings.DB_STREAM_CHUNK)
+    df = device_info_cache.process_chunks(chunks, keep_info=False)
+    if "uuid" not in df.columns:
+        key = next((c for c in ("device_uuid", "board_uuid") if c in df.columns), None)
+        if key:
+            df = df.rename(columns={key: "uuid"})
+    return df
+
+COLLECTORS = {
+    "devices": collect_devices,
+    "sims": collect_sims,
+    "pools": collect_pools,
+    "boards": collect_boards,
+}
+
+
+def ingest_once(store, core, db, datasets=None):
+    """Una foto de cada dataset con la misma marca de tiempo. Un fallo no para al resto."""
+    ts = datetime.now().replace(microsecond=0)
+    written = {}
+    for name in datasets or DATASETS:
+        try:
+            rows = store.append(name, COLLECTORS[name](core, db), ts)
+            written[name] = rows
+            print(f"💾 [{ts:%H:%M:%S}] {name}: {rows} filas")
+        except Exception as e:
+            print(f"❌ Fallo al ingerir {name}: {e}")
+    for name in datasets or DATASETS:
+        compacted = store.compact_closed(name)
+        if compacted:
+            print(f"🗜️ {name}: {compacted} ficheros compactados")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta periódica de métricas de flota en el almacén local")
+    parser.add_argument("--daemon", action="store_true", help="Ejecutar en bucle")
+    parser.add_argument("--interval", type=float, default=Settings.METRICS_INGEST_INTERVAL, help="Segundos entre ingestas")
+    parser.add_argument("--datasets", nargs="*", choices=sorted(DATASETS), help="Solo estos datasets")
+    args = parser.parse_args()
+
+    store = MetricsStore()
+    core = CoreClient()
+    db = DatabaseAdapter()
+
+    if not args.daemon:
+        ingest_once(store, core, db, args.datasets)
+        sys.exit(0)
+
+    running = True
+
+    def _stop(*_):
+        global running
+        print("🛑 Deteniendo ingesta...")
+        running = False
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"🚀 Ingesta de métricas iniciada (cada {args.interval}s) en {store.root}")
+
+    while running:
+        started = time.monotonic()
+        ingest_once(store, core, db, args.datasets)
+        deadline = started + args.interval
+        # Dormir en tramos cortos para responder rápido a SIGTERM
+        while running and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
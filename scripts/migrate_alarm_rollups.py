@@ -0,0 +1,68 @@
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+
+# Añadir la raíz del proyecto al path para poder importar desde 'app'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import DatabaseAdapter
+from app import alarm_rollups
+
+TIMESTAMP_INDEX = "idx_alarm_counts_timestamp"
+
+
+def ensure_schema(db):
+    """Crea las tablas de rollup, la de desglose y el índice sobre alarm_counts.timestamp si faltan."""
+    for stmt in alarm_rollups.create_table_statements() + alarm_rollups.create_breakdown_statements():
+        db.execute_query(stmt)
+
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW INDEX FROM alarm_counts")
+        indexes = {row["Key_name"] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    if TIMESTAMP_INDEX not in indexes:
+        print(f"🛠️ Creando índice {TIMESTAMP_INDEX}")
+        db.execute_query(f"CREATE INDEX `{TIMESTAMP_INDEX}` ON alarm_counts (`timestamp`)")
+
+
+def compact(db, since, until):
+    """Recalcula los rollups de [since, until) desde alarm_counts (idempotente)."""
+    for bucket in alarm_rollups.ROLLUP_TABLES:
+        # Alinear al inicio del bucket para recalcularlo entero
+        start = alarm_rollups.bucket_start(since, bucket)
+        db.execute_query(alarm_rollups.compaction_statement(bucket), (start, until))
+        print(f"✅ Rollup '{bucket}' recalculado desde {start:%Y-%m-%d %H:%M}")
+
+
+def prune_breakdown(db, keep_days):
+    """Retención del desglose horario: borra los buckets de hace más de keep_days días."""
+    cutoff = alarm_rollups.bucket_start(datetime.now() - timedelta(days=keep_days), alarm_rollups.BREAKDOWN_BUCKET)
+    db.execute_query(alarm_rollups.breakdown_prune_statement(), (cutoff,))
+    print(f"🧹 Desglose de alarmas anterior a {cutoff:%Y-%m-%d %H:%M} eliminado")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tablas de rollup de alarm_counts")
+    parser.add_argument("--backfill", action="store_true", help="Recalcular todo el histórico")
+    parser.add_argument("--days", type=int, default=None, help="Recalcular solo los últimos N días (compactación)")
+    parser.add_argument("--breakdown-days", type=int, default=None, help="Conservar solo N días del desglose por organización/modelo")
+    args = parser.parse_args()
+
+    db = DatabaseAdapter()
+    ensure_schema(db)
+    print("✅ Esquema de rollups listo.")
+
+    until = datetime.now() + timedelta(seconds=1)
+    if args.backfill:
+        compact(db, datetime(1970, 1, 1), until)
+    elif args.days is not None:
+        compact(db, until - timedelta(days=args.days), until)
+
+    if args.breakdown_days is not None:
+        prune_breakdown(db, args.breakdown_days)
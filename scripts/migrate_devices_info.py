@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Añadir la raíz del proyecto al path para poder importar desde 'app'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import DatabaseAdapter, INFO_GENERATED_COLUMNS, INFO_INDEXED_COLUMNS
+
+_NUMERIC_JSON_TYPES = "('INTEGER', 'UNSIGNED INTEGER', 'DOUBLE', 'DECIMAL')"
+
+
+def column_expression(path, sql_type):
+    """
+    Expresión de la columna generada. Tolera 'info' inválido o con tipos inesperados
+    (devuelve NULL) para que un registro raro no bloquee los INSERT/UPDATE.
+    """
+    extracted = f"JSON_EXTRACT(info, '{path}')"
+    if sql_type == "JSON":
+        return f"IF(JSON_VALID(info), {extracted}, NULL)"
+    if sql_type == "DOUBLE":
+        return (
+            f"IF(JSON_VALID(info) AND JSON_TYPE({extracted}) IN {_NUMERIC_JSON_TYPES}, "
+            f"CAST({extracted} AS DOUBLE), NULL)"
+        )
+    # Texto: "2026-01-14 12:31:44+00:00" → "2026-01-14" para compilation_date (VARCHAR(10))
+    length = sql_type[sql_type.index("(") + 1:-1]
+    return (
+        f"IF(JSON_VALID(info), LEFT(NULLIF(JSON_UNQUOTE({extracted}), 'null'), {length}), NULL)"
+    )
+
+
+def build_statements(existing_columns, existing_indexes):
+    statements = []
+    for name, path, sql_type in INFO_GENERATED_COLUMNS:
+        if name in existing_columns:
+            continue
+        statements.append(
+            f"ALTER TABLE devices_info ADD COLUMN `{name}` {sql_type} "
+            f"AS ({column_expression(path, sql_type)}) STORED"
+        )
+    for name in INFO_INDEXED_COLUMNS:
+        index_name = f"idx_devices_info_{name}"
+        if index_name in existing_indexes:
+            continue
+        statements.append(f"CREATE INDEX `{index_name}` ON devices_info (`{name}`)")
+    return statements
+
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv
+    db = DatabaseAdapter()
+
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW COLUMNS FROM devices_info")
+        existing_columns = {row["Field"] for row in cursor.fetchall()}
+        cursor.execute("SHOW INDEX FROM devices_info")
+        existing_indexes = {row["Key_name"] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    statements = build_statements(existing_columns, existing_indexes)
+    if not statements:
+        print("✅ devices_info ya tiene todas las columnas generadas.")
+        sys.exit(0)
+
+    for stmt in statements:
+        print(f"🛠️ {stmt}")
+        if not dry_run:
+            db.execute_query(stmt)
+
+    print("✅ Migración completada." if not dry_run else "ℹ️ Dry run: no se ha modificado la BD.")
@@ -1,87 +1,330 @@
 import sys
 import os
+import time
+import random
+import signal
+import argparse
 from datetime import datetime
 import json
 
 # Añadir la raíz del proyecto al path para poder importar desde 'app'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from collections import Counter
+
 from app.cloud_client import CloudClient
+from app.api_client import CoreClient
 from app.database import DatabaseAdapter
+from app.logic.data_device import build_device_index
 
 # Mapeo de constantes de Kiconex
 TYPE_LINK = 1
 TYPE_ENTITY = 2
 TYPE_SIM = 3
 
+STAT_KEYS = [
+    'disconnected_device',
+    'disconnected_control',
+    'parameters',
+    'sim_high',
+    'sim_critical',
+]
+
+def empty_stats():
+    return {key: 0 for key in STAT_KEYS}
+
+def alarm_category(alarm):
+    """Contador al que suma la alarma, o None si no cuenta (no activa / tipo desconocido)."""
+    # Filtro: solo procesar alarmas activas (state == 1)
+    if alarm.get('alarm_state') != 1:
+        return None
+
+    a_type = alarm.get('alarm_type')
+    a_control = alarm.get('alarm_control_uuid')
+    a_severity = alarm.get('alarm_severity')
+
+    if a_type == TYPE_LINK:
+        return 'disconnected_control' if a_control else 'disconnected_device'
+    if a_type == TYPE_ENTITY:
+        return 'parameters'
+    if a_type == TYPE_SIM:
+        if a_severity == 'sim-high':
+            return 'sim_high'
+        if a_severity == 'sim-critical':
+            return 'sim_critical'
+    return None
+
 def categorize_alarms(alarms):
-    stats = {
-        'disconnected_device': 0,
-        'disconnected_control': 0,
-        'parameters': 0,
-        'sim_high': 0,
-        'sim_critical': 0
-    }
-    
-    if not isinstance(alarms, list):
+    """Cuenta por categoría. Acepta una lista o un generador (p.ej. CloudClient.iter_alarms)."""
+    stats = empty_stats()
+
+    if isinstance(alarms, (dict, str, bytes)) or not hasattr(alarms, '__iter__'):
         print("⚠️ Formato de respuesta inesperado (se esperaba lista).")
         return stats
 
     for alarm in alarms:
-        # Filtro: solo procesar alarmas activas (state == 1)
-        if alarm.get('alarm_state') != 1:
-            continue
-
-        a_type = alarm.get('alarm_type')
-        a_control = alarm.get('alarm_control_uuid')
-        a_severity = alarm.get('alarm_severity')
-
-        if a_type == TYPE_LINK:
-            if not a_control:
-                stats['disconnected_device'] += 1
-            else:
-                stats['disconnected_control'] += 1
-        elif a_type == TYPE_ENTITY:
-            stats['parameters'] += 1
-        elif a_type == TYPE_SIM:
-            if a_severity == 'sim-high':
-                stats['sim_high'] += 1
-            elif a_severity == 'sim-critical':
-                stats['sim_critical'] += 1
+        category = alarm_category(alarm)
+        if category:
+            stats[category] += 1
 
     return stats
 
-def save_to_db(stats):
-    db = DatabaseAdapter()
-    query = """
-        INSERT INTO alarm_counts 
-        (disconnected_device, disconnected_control, parameters, sim_high, sim_critical, timestamp)
-        VALUES (%s, %s, %s, %s, %s, %s)
-    """
-    values = (
-        stats['disconnected_device'],
-        stats['disconnected_control'],
-        stats['parameters'],
-        stats['sim_high'],
-        stats['sim_critical'],
-        datetime.now()
+# ================================
+# DESGLOSE POR ORGANIZACIÓN / MODELO
+# ================================
+
+UNKNOWN_DEVICE = {"organization": "SIN ASIGNAR", "model": "Desconocido"}
+
+def alarm_device_uuid(alarm):
+    """uuid (normalizado) del dispositivo de la alarma; el control solo si no hay dispositivo."""
+    for field in ('alarm_device_uuid', 'device_uuid', 'alarm_board_uuid', 'board_uuid', 'alarm_control_uuid'):
+        value = alarm.get(field)
+        if value:
+            return str(value).strip().lower()
+    return None
+
+def load_device_index(core=None):
+    """Índice uuid → organización/modelo a partir de boards, kiwi, modelos y software."""
+    core = core or CoreClient()
+    return build_device_index(
+        core.get_devicesB(),
+        core.get_deviceModels(),
+        core.get_deviceSoftware(),
+        core.get_devicesKiwi(),
     )
-    
+
+def alarm_dimensions(alarm, category, device_index):
+    """Clave (organización, modelo, categoría) de una alarma ya categorizada."""
+    device = device_index.get(alarm_device_uuid(alarm)) or UNKNOWN_DEVICE
+    return (device["organization"], device["model"], category)
+
+def breakdown_alarms(alarms, device_index):
+    """Contadores por categoría y desglose por (organización, modelo, categoría) en una sola pasada."""
+    stats = empty_stats()
+    breakdown = Counter()
+    for alarm in alarms:
+        category = alarm_category(alarm)
+        if category:
+            stats[category] += 1
+            breakdown[alarm_dimensions(alarm, category, device_index)] += 1
+    return stats, breakdown
+
+def save_breakdown(breakdown, db=None, ts=None):
+    db = db or DatabaseAdapter()
+    try:
+        db.save_alarm_breakdown(breakdown, ts or datetime.now())
+        return True
+    except Exception as e:
+        print(f"❌ Fallo al guardar desglose: {e}")
+        return False
+
+def save_to_db(stats, db=None):
+    db = db or DatabaseAdapter()
     try:
-        db.execute_query(query, values)
+        # Inserta la muestra y actualiza los rollups horario/diario/mensual
+        db.save_alarm_counts(stats, datetime.now())
         print(f"✅ [{datetime.now()}] Persistencia en BD exitosa.")
+        return True
     except Exception as e:
         print(f"❌ Fallo al guardar en BD: {e}")
+        return False
+
+
+# ================================
+# MODO DAEMON
+# ================================
+
+# Campos candidatos con el inicio de la alarma (distinguen alarmas sin id sobre el mismo origen)
+ALARM_START_FIELDS = ('alarm_start', 'alarm_start_date', 'alarm_date', 'alarm_created_at', 'created_at')
+
+def alarm_key(alarm):
+    """Identidad estable de una alarma entre descargas."""
+    for field in ('alarm_uuid', 'uuid', 'alarm_id', 'id'):
+        if alarm.get(field) is not None:
+            return (field, alarm[field])
+    start = next((alarm[f] for f in ALARM_START_FIELDS if alarm.get(f) is not None), None)
+    return (
+        alarm.get('alarm_type'),
+        alarm.get('alarm_device_uuid'),
+        alarm.get('alarm_control_uuid'),
+        alarm.get('alarm_entity_uuid'),
+        alarm.get('alarm_severity'),
+        start,
+    )
+
+
+class AlarmCollector:
+    """
+    Collector de larga duración: reutiliza la sesión HTTP y el pool de BD,
+    mantiene en memoria el conjunto de alarmas anterior y actualiza los contadores
+    con el delta (alarmas nuevas / resueltas). Escribe en BD cuando cambian y, aunque
+    no cambien, al menos una muestra por hora (latido) para que los rollups no
+    tengan huecos en las horas tranquilas.
+    """
+
+    def __init__(self, client=None, db=None, interval=30, max_backoff=300, core=None, index_ttl=3600):
+        self.client = client or CloudClient()
+        self.db = db or DatabaseAdapter()
+        self.core = core
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.index_ttl = index_ttl
+        self.device_index = {}
+        self.index_loaded_at = None
+        self.active = {}            # clave de alarma -> (categoría, organización, modelo)
+        self.stats = empty_stats()
+        self.breakdown = Counter()  # (organización, modelo, categoría) -> n
+        self.last_saved = None      # últimos contadores persistidos
+        self.last_saved_hour = None # hora (bucket horario) de la última muestra persistida
+        self.last_breakdown = None
+        self.failures = 0
+        self.running = True
+
+    def refresh_device_index(self, force=False):
+        """Recarga el índice uuid → organización/modelo cuando caduca (index_ttl)."""
+        now = time.monotonic()
+        if not force and self.index_loaded_at is not None and now - self.index_loaded_at < self.index_ttl:
+            return
+        try:
+            self.device_index = load_device_index(self.core)
+            print(f"🗂️ Índice de dispositivos cargado ({len(self.device_index)} uuids)")
+        except Exception as e:
+            # Se mantiene el índice anterior; se reintenta en el próximo ciclo
+            print(f"⚠️ No se pudo cargar el índice de dispositivos: {e}")
+            if self.index_loaded_at is not None:
+                self.index_loaded_at = now
+            return
+        self.index_loaded_at = now
+
+    def apply_delta(self, alarms):
+        """
+        Actualiza self.stats y self.breakdown con las alarmas nuevas y resueltas.
+        Devuelve (nuevas, resueltas).
+        """
+        current = {}
+        seen = Counter()
+        for alarm in alarms:
+            category = alarm_category(alarm)
+            if category:
+                # Repeticiones de la misma clave en una descarga cuentan por separado,
+                # igual que en categorize_alarms
+                base = alarm_key(alarm)
+                key = (base, seen[base])
+                seen[base] += 1
+                previous = self.active.get(key)
+                # Alarma ya conocida: se conserva su organización/modelo sin volver a cruzar
+                if previous is not None and previous[2] == category:
+                    current[key] = previous
+                else:
+                    current[key] = alarm_dimensions(alarm, category, self.device_index)
+
+        new_count = cleared_count = 0
+        for key, dims in self.active.items():
+            if current.get(key) != dims:
+                self.stats[dims[2]] -= 1
+                self.breakdown[dims] -= 1
+                cleared_count += 1
+        for key, dims in current.items():
+            if self.active.get(key) != dims:
+                self.stats[dims[2]] += 1
+                self.breakdown[dims] += 1
+                new_count += 1
+
+        self.active = current
+        return new_count, cleared_count
+
+    def collect_once(self):
+        self.refresh_device_index()
+        # Generador: se categoriza mientras se descarga; un fallo a mitad deja el estado intacto
+        alarms = self.client.iter_alarms(state="1,2", raise_errors=True)
+
+        new_count, cleared_count = self.apply_delta(alarms)
+        if new_count or cleared_count:
+            print(f"🔔 [{datetime.now():%H:%M:%S}] +{new_count} nuevas / -{cleared_count} resueltas")
+
+        saved = True
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        if self.stats != self.last_saved or hour != self.last_saved_hour:
+            saved = save_to_db(dict(self.stats), self.db)
+            if saved:
+                self.last_saved = dict(self.stats)
+                self.last_saved_hour = hour
+
+        breakdown = +self.breakdown
+        if breakdown != self.last_breakdown:
+            if save_breakdown(breakdown, self.db):
+                self.last_breakdown = breakdown
+
+        if not saved:
+            # Cuenta como fallo del ciclo: run() aplica backoff y se reintenta la escritura
+            raise RuntimeError("No se pudieron guardar los contadores en BD")
+
+    def next_delay(self):
+        """Intervalo normal, o backoff exponencial con jitter tras fallos consecutivos."""
+        if not self.failures:
+            return self.interval
+        backoff = min(self.max_backoff, self.interval * (2 ** self.failures))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def stop(self, *_):
+        print("🛑 Deteniendo collector...")
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"🚀 Collector de alarmas iniciado (cada {self.interval}s)")
+
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.collect_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Fallo en la recogida ({self.failures} seguidos): {e}")
+
+            delay = max(0.0, self.next_delay() - (time.monotonic() - started))
+            # Dormir en tramos cortos para responder rápido a SIGTERM
+            deadline = time.monotonic() + delay
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1.0, deadline - time.monotonic()))
+
+        self.client.close()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recogida de alarmas de Kiconex Cloud")
+    parser.add_argument("--daemon", action="store_true", help="Ejecutar en bucle con planificador interno")
+    parser.add_argument("--interval", type=float, default=30, help="Segundos entre recogidas (modo daemon)")
+    parser.add_argument("--max-backoff", type=float, default=300, help="Espera máxima tras fallos (s)")
+    args = parser.parse_args()
+
+    if args.daemon:
+        AlarmCollector(interval=args.interval, max_backoff=args.max_backoff).run()
+        sys.exit(0)
+
     # Uso del nuevo CloudClient
     client = CloudClient()
-    data = client.get_alarms(state="1,2")
-    
-    if data:
-        results = categorize_alarms(data)
+    try:
+        device_index = load_device_index()
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar el índice de dispositivos: {e}")
+        device_index = {}
+
+    try:
+        # Las alarmas se cuentan según llegan, sin materializar la respuesta
+        results, breakdown = breakdown_alarms(client.iter_alarms(state="1,2", raise_errors=True), device_index)
+    except Exception:
+        results = None
+    finally:
+        client.close()
+
+    if results is None:
+        print("⚠️ No hay datos para procesar.")
+    else:
         print(f"📊 Resumen de Categorización:")
         print(json.dumps(results, indent=2))
-        save_to_db(results)
-    else:
-        print("⚠️ No hay datos para procesar.")
+        db = DatabaseAdapter()
+        save_to_db(results, db)
+        save_breakdown(breakdown, db)